@@ -0,0 +1,238 @@
+"""Reading analytics: pace and finish estimates per book, daily streaks,
+rolling velocity and weekday/hour heatmaps.
+
+Everything is derived from the rollup tables that the updates trigger keeps
+current (daily_book_stats, hourly_stats and the lifetime totals on
+book_activity), never from the raw log, so the cost follows the number of
+days and books rather than the number of updates.
+"""
+import math
+import threading
+from array import array
+from datetime import date
+from itertools import accumulate
+from operator import add
+
+import database
+from metrics import timed
+
+# Days of history behind "velocity", the recent pages per day
+VELOCITY_DAYS = 14
+
+HEATMAP_CELLS = 7 * 24
+
+# Weekday counts from Monday = 0, like date.weekday() and the weekly rollup
+_HEATMAP_QUERY = """
+    SELECT (CAST(strftime('%w', substr(hour, 1, 10)) AS INTEGER) + 6) % 7 * 24
+           + CAST(substr(hour, 12, 2) AS INTEGER), SUM(pages_read), SUM(sessions)
+    FROM hourly_stats WHERE {where} GROUP BY 1
+"""
+
+_DAYS_QUERY = """
+    SELECT substr(hour, 1, 10), SUM(pages_read), SUM(sessions)
+    FROM hourly_stats WHERE {where} GROUP BY 1
+"""
+
+_BOOKS_QUERY = """
+    SELECT b.id, b.total_pages, b.current_page,
+           COALESCE(a.pages_read, 0), COALESCE(a.reading_days, 0), COALESCE(r.pages_read, 0)
+    FROM books b
+    LEFT JOIN book_activity a ON a.book_id = b.id
+    LEFT JOIN (
+        SELECT book_id, SUM(pages_read) AS pages_read FROM daily_book_stats
+        WHERE day >= ? GROUP BY book_id
+    ) r ON r.book_id = b.id
+    ORDER BY b.id
+"""
+
+
+def zeros(count):
+    return array("q", bytes(8 * count))
+
+
+class ReadingAnalytics:
+    """Analytics held as columnar arrays and refreshed incrementally.
+
+    A full load folds every rollup row before today, the settled day, into
+    per-day and heatmap arrays. Later refreshes re-read only the rows from
+    the settled day on, where new updates land, plus the small per-book
+    totals. Commits from this or any other connection are noticed through
+    ``total_changes`` and ``PRAGMA data_version``; nothing is re-read while
+    neither moves. Updates backdated before the settled day, a deleted book
+    or ``refresh(full=True)`` (after ``rollups.py rebuild``, say) reload
+    everything.
+    """
+
+    def __init__(self, velocity_days=VELOCITY_DAYS):
+        self.velocity_days = velocity_days
+        self.lock = threading.RLock()
+        self.signature = None
+        self.mark = None
+        self.settled = None
+        self.first_day = None
+        self.today = None
+        self.settled_pages = zeros(0)
+        self.settled_sessions = zeros(0)
+        self.settled_heat_pages = zeros(HEATMAP_CELLS)
+        self.settled_heat_sessions = zeros(HEATMAP_CELLS)
+        self.day_pages = zeros(0)
+        self.day_sessions = zeros(0)
+        self.heat_pages = zeros(HEATMAP_CELLS)
+        self.heat_sessions = zeros(HEATMAP_CELLS)
+        self.ids = array("q")
+        self.total_pages = array("q")
+        self.current_pages = array("q")
+        self.pages_read = array("q")
+        self.reading_days = array("q")
+        self.recent_pages = array("q")
+        self.full_loads = 0
+        self.refreshes = 0
+
+    def refresh(self, full=False):
+        """Bring the arrays up to date; returns True if anything was re-read"""
+        conn = database.get_connection()
+        signature = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes,
+                     date.today())
+        with self.lock:
+            if not full and signature == self.signature:
+                return False
+            self._refresh(conn, full)
+            # The reads above changed nothing, so the signature still holds
+            self.signature = signature
+            return True
+
+    @timed("analytics.refresh")
+    def _refresh(self, conn, full):
+        today = date.today()
+        mark = conn.execute("SELECT COALESCE(MAX(id), 0) FROM updates").fetchone()[0]
+        if self.settled is None or mark < self.mark:
+            full = True
+        elif mark > self.mark:
+            # The + keeps SQLite on the rowid range instead of walking the timestamp index
+            oldest = conn.execute("SELECT MIN(+timestamp) FROM updates WHERE id > ?",
+                                  (self.mark,)).fetchone()[0]
+            full = full or oldest < self.settled
+        books = conn.execute(_BOOKS_QUERY, (database.days_ago(self.velocity_days - 1),)).fetchall()
+        ids = array("q", [row[0] for row in books])
+        if not full and not set(self.ids).issubset(ids):
+            full = True  # A deleted book took its share out of the settled days
+        if full:
+            self._load_settled(conn, today)
+        self._load_recent(conn, today)
+        self.ids = ids
+        columns = list(zip(*books)) or [()] * 6
+        (self.total_pages, self.current_pages, self.pages_read,
+         self.reading_days, self.recent_pages) = (array("q", column) for column in columns[1:])
+        self.mark = mark
+        self.today = today
+        self.refreshes += 1
+
+    def _load_settled(self, conn, today):
+        self.settled = today.isoformat()
+        where = "hour < ?"
+        days = conn.execute(_DAYS_QUERY.format(where=where), (self.settled,)).fetchall()
+        self.first_day = date.fromisoformat(days[0][0]).toordinal() if days else today.toordinal()
+        count = today.toordinal() - self.first_day
+        self.settled_pages, self.settled_sessions = zeros(count), zeros(count)
+        for day, pages, sessions in days:
+            index = date.fromisoformat(day).toordinal() - self.first_day
+            self.settled_pages[index] = pages
+            self.settled_sessions[index] = sessions
+        self.settled_heat_pages, self.settled_heat_sessions = self._heatmap(conn, where)
+        self.full_loads += 1
+
+    def _load_recent(self, conn, today):
+        where = "hour >= ?"
+        count = today.toordinal() - self.first_day + 1
+        pages = self.settled_pages + zeros(count - len(self.settled_pages))
+        sessions = self.settled_sessions + zeros(count - len(self.settled_sessions))
+        for day, day_pages, day_sessions in conn.execute(_DAYS_QUERY.format(where=where),
+                                                         (self.settled,)):
+            index = date.fromisoformat(day).toordinal() - self.first_day
+            if index < count:
+                pages[index] = day_pages
+                sessions[index] = day_sessions
+        self.day_pages, self.day_sessions = pages, sessions
+        heat_pages, heat_sessions = self._heatmap(conn, where)
+        self.heat_pages = array("q", map(add, self.settled_heat_pages, heat_pages))
+        self.heat_sessions = array("q", map(add, self.settled_heat_sessions, heat_sessions))
+
+    def _heatmap(self, conn, where):
+        pages, sessions = zeros(HEATMAP_CELLS), zeros(HEATMAP_CELLS)
+        for cell, cell_pages, cell_sessions in conn.execute(_HEATMAP_QUERY.format(where=where),
+                                                            (self.settled,)):
+            pages[cell] = cell_pages
+            sessions[cell] = cell_sessions
+        return pages, sessions
+
+    # Reads
+
+    def daily_totals(self):
+        """(day, pages_read, sessions) for every day from the first update to today"""
+        with self.lock:
+            self.refresh()
+            first = self.first_day
+            return [(date.fromordinal(first + i).isoformat(), pages, sessions)
+                    for i, (pages, sessions) in enumerate(zip(self.day_pages, self.day_sessions))]
+
+    def rolling_velocity(self, days=None):
+        """(day, pages_read, pages per day over the ``days`` days ending there)"""
+        days = days or self.velocity_days
+        with self.lock:
+            self.refresh()
+            pages = self.day_pages
+            totals = list(accumulate(pages, initial=0))
+            window_start = ([0] * (days - 1) + totals)[:len(pages)]
+            first = self.first_day
+            return [(date.fromordinal(first + i).isoformat(), day_pages, (end - start) / days)
+                    for i, (day_pages, end, start)
+                    in enumerate(zip(pages, totals[1:], window_start))]
+
+    def book_stats(self):
+        """Per-book rows ``(book_id, pages_read, reading_days, pages_per_day,
+        velocity, remaining, eta)``.
+
+        ``pages_per_day`` is the lifetime pace on days the book was read,
+        ``velocity`` the pages per day over the last ``velocity_days`` days.
+        ``eta`` is the ISO day the book would be finished at that velocity,
+        or None when it is finished or has not been read lately.
+        """
+        with self.lock:
+            self.refresh()
+            days = self.velocity_days
+            today = self.today.toordinal()
+            remaining = [max(total - current, 0)
+                         for total, current in zip(self.total_pages, self.current_pages)]
+            velocity = [recent / days for recent in self.recent_pages]
+            pace = [pages / reading_days if reading_days else 0.0
+                    for pages, reading_days in zip(self.pages_read, self.reading_days)]
+            eta = [date.fromordinal(today + math.ceil(left / speed)).isoformat()
+                   if left and speed else None
+                   for left, speed in zip(remaining, velocity)]
+            return list(zip(self.ids, self.pages_read, self.reading_days, pace,
+                            velocity, remaining, eta))
+
+    def streaks(self):
+        """Current and longest runs of consecutive days with pages read.
+
+        The current streak still counts when nothing has been read yet today.
+        """
+        with self.lock:
+            self.refresh()
+            read = bytes(map(bool, self.day_pages))
+        runs = read.split(b"\0")
+        current = len(runs[-1]) or (len(runs[-2]) if len(runs) > 1 else 0)
+        return {"current": current, "longest": max(map(len, runs))}
+
+    def heatmap(self):
+        """(weekday, hour, pages_read, sessions) for all 168 cells, Monday = 0"""
+        with self.lock:
+            self.refresh()
+            return [(cell // 24, cell % 24, pages, sessions)
+                    for cell, (pages, sessions)
+                    in enumerate(zip(self.heat_pages, self.heat_sessions))]
+
+    def stats(self):
+        with self.lock:
+            return {"full_loads": self.full_loads, "refreshes": self.refreshes,
+                    "days": len(self.day_pages), "books": len(self.ids)}
@@ -0,0 +1,261 @@
+"""Online snapshots of the database, taken while the app keeps writing.
+
+Snapshots are named ``<db name>-YYYYmmdd-HHMMSS-ffffff.db.gz`` (``.db`` without
+compression) and each has a ``.sha256`` file beside it in ``sha256sum``
+format, so ``sha256sum -c`` can check them too.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import database
+from metrics import timed
+from utils import make_temp_file
+
+BACKUP_DIR = "backups"
+KEEP_SNAPSHOTS = 7
+
+# Pages copied per backup step; the copy runs without the GIL, a step at a time
+STEP_PAGES = 256
+CHUNK_SIZE = 1024 * 1024
+# gzip level; higher levels shrink database pages only ~10% more at a
+# third of the speed or less
+COMPRESS_LEVEL = 1
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class HashingWriter:
+    """Write-only file wrapper that hashes what passes through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def snapshot_prefix(db_path=None):
+    return os.path.splitext(os.path.basename(db_path or database.DB_PATH))[0] + "-"
+
+
+def list_snapshots(directory=BACKUP_DIR, db_path=None):
+    """Snapshot paths of the database, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    prefix = snapshot_prefix(db_path)
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.startswith(prefix) and name.endswith((".db", ".db.gz"))]
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def copy_chunks(src, dst, cancel=None):
+    """Copy one file object to another a chunk at a time, stopping once ``cancel`` is set"""
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled()
+        dst.write(chunk)
+
+
+def copy_database(target_path, step_pages=STEP_PAGES, pause=0.0, progress=None, cancel=None):
+    """Copy the live database to ``target_path`` with the online backup API.
+
+    The source connection holds one read transaction throughout. In WAL mode
+    that pins a single snapshot: writers keep committing, and since the pages
+    being copied cannot change underneath, the copy never restarts.
+    ``progress(done, total)`` is called in pages after each step, ``pause``
+    seconds are slept between steps, and setting ``cancel`` aborts the copy.
+    """
+    source = sqlite3.connect(database.DB_PATH)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        target = sqlite3.connect(target_path)
+
+        def step(status, remaining, total):
+            if cancel is not None and cancel.is_set():
+                raise BackupCancelled()
+            if progress is not None:
+                progress(total - remaining, total)
+            if pause and remaining:
+                time.sleep(pause)
+
+        try:
+            source.backup(target, pages=step_pages, progress=step)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+@timed("backup.create_snapshot")
+def create_snapshot(directory=BACKUP_DIR, compress=True, step_pages=STEP_PAGES, pause=0.0,
+                    progress=None, cancel=None):
+    """Write a checksummed snapshot of the database into ``directory``.
+
+    The database is copied page by page to a temporary file (see
+    ``copy_database``), then streamed through gzip into the snapshot file
+    while its SHA-256 is taken. Setting ``cancel`` stops either stage within
+    a step or a chunk. Nothing appears under the final name until it is
+    complete. Returns the snapshot path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(directory, f"{snapshot_prefix()}{stamp}.db" + (".gz" if compress else ""))
+    temporary = []
+    for suffix in (".db.tmp", ".tmp", ".sha256.tmp"):
+        temporary.append(make_temp_file(directory, suffix))
+    copy_path, tmp_path, checksum_path = temporary
+    try:
+        copy_database(copy_path, step_pages, pause, progress, cancel)
+        with open(copy_path, "rb") as src, open(tmp_path, "wb") as raw:
+            out = HashingWriter(raw)
+            if compress:
+                with gzip.GzipFile(filename="", mode="wb", fileobj=out,
+                                   compresslevel=COMPRESS_LEVEL, mtime=0) as gz:
+                    copy_chunks(src, gz, cancel)
+            else:
+                copy_chunks(src, out, cancel)
+        with open(checksum_path, "w") as f:
+            f.write(f"{out.sha256.hexdigest()}  {os.path.basename(path)}\n")
+        os.replace(tmp_path, path)
+        os.replace(checksum_path, path + ".sha256")
+    finally:
+        for tmp in temporary:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return path
+
+
+def rotate_snapshots(directory=BACKUP_DIR, keep=KEEP_SNAPSHOTS):
+    """Delete all but the newest ``keep`` snapshots; returns the paths removed"""
+    snapshots = list_snapshots(directory)
+    removed = snapshots[:max(len(snapshots) - keep, 0)]
+    for path in removed:
+        os.remove(path)
+        if os.path.exists(path + ".sha256"):
+            os.remove(path + ".sha256")
+    return removed
+
+
+def verify_snapshot(path):
+    """Raise SnapshotError unless ``path`` matches its recorded checksum"""
+    try:
+        with open(path + ".sha256") as f:
+            expected = f.read().split()[0]
+    except (OSError, IndexError):
+        raise SnapshotError(f"no checksum recorded for {path}")
+    if file_sha256(path) != expected:
+        raise SnapshotError(f"{path} does not match its checksum")
+
+
+@timed("backup.restore_snapshot")
+def restore_snapshot(path, snapshot_current=True):
+    """Replace the database contents with a verified snapshot.
+
+    The snapshot is checked against its checksum, unpacked next to the
+    database and given a quick_check before anything is touched; with
+    ``snapshot_current`` the present database is snapshotted first. The
+    contents are then written in through the backup API in one step, under
+    SQLite's own locking, so other connections see either the old database
+    or the restored one. Returns the path of the pre-restore snapshot or None.
+    """
+    verify_snapshot(path)
+    directory = os.path.dirname(os.path.abspath(database.DB_PATH))
+    fd, unpacked = tempfile.mkstemp(dir=directory, suffix=".db.tmp")
+    os.close(fd)
+    try:
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as src, \
+                open(unpacked, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        source = sqlite3.connect(unpacked)
+        try:
+            if source.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise SnapshotError(f"{path} holds a damaged database")
+            previous = create_snapshot(os.path.dirname(path) or ".") if snapshot_current else None
+            target = sqlite3.connect(database.DB_PATH)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        os.remove(unpacked)
+    # Pooled connections reopen lazily and see the restored schema
+    database.close_connections()
+    return previous
+
+
+class ScheduledBackup:
+    """Take a snapshot on a worker thread, then rotate old ones.
+
+    ``start`` returns immediately. It does nothing while a run is in
+    progress or while the newest snapshot is less than ``min_age`` seconds
+    old, so it can be called on a timer and at every startup alike.
+    ``stop`` cancels a running copy and waits for the thread;
+    ``on_error(exc)`` is called from the worker thread.
+    """
+
+    def __init__(self, directory=BACKUP_DIR, keep=KEEP_SNAPSHOTS, min_age=0, on_error=None,
+                 **options):
+        self.directory = directory
+        self.keep = keep
+        self.min_age = min_age
+        self.options = options
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def due(self):
+        snapshots = list_snapshots(self.directory)
+        return not snapshots or time.time() - os.path.getmtime(snapshots[-1]) >= self.min_age
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.cancel_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            if self.due():
+                create_snapshot(self.directory, cancel=self.cancel_event, **self.options)
+                rotate_snapshots(self.directory, self.keep)
+        except BackupCancelled:
+            pass
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+
+    def stop(self):
+        self.cancel_event.set()
+        if self.thread is not None:
+            self.thread.join()
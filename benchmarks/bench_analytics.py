@@ -0,0 +1,68 @@
+"""Reading analytics over a multi-year synthetic library: full load, refreshes
+after new updates, and the same heatmap computed from the raw log for scale.
+
+Run from the project root:  python benchmarks/bench_analytics.py [books] [updates] [years]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from analytics import ReadingAnalytics
+from generate import generate_library
+
+
+def timed_call(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def everything(analytics):
+    analytics.book_stats()
+    analytics.rolling_velocity()
+    analytics.streaks()
+    analytics.heatmap()
+
+
+def main():
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    years = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_library(os.path.join(tmp, "library.db"), books, updates, years)
+        conn = database.get_connection()
+        days = conn.execute("SELECT COUNT(*) FROM daily_book_stats").fetchone()[0]
+        print(f"{books} books, {updates} updates over {years} years ({days} book-days)")
+
+        analytics = ReadingAnalytics()
+        cold = timed_call(lambda: everything(analytics))
+        print(f"full load, every report       {cold * 1000:9.1f} ms")
+        print(f"reports again, nothing new    {timed_call(lambda: everything(analytics)) * 1000:9.1f} ms")
+
+        for batch in (1, 100):
+            for i in range(batch):
+                database.update_page(i % books + 1, 10000 + i)
+            elapsed = timed_call(lambda: everything(analytics))
+            print(f"reports after {batch:3d} new updates {elapsed * 1000:9.1f} ms")
+
+        database.delete_book(books)
+        elapsed = timed_call(lambda: everything(analytics))
+        print(f"reports after a deleted book  {elapsed * 1000:9.1f} ms (full reload)")
+        print(analytics.stats())
+
+        start = time.perf_counter()
+        conn.execute(database.rollup_deltas(*database.ROLLUP_SOURCE) + """
+            SELECT strftime('%w', timestamp), substr(timestamp, 12, 2), SUM(pages), SUM(sessions)
+            FROM deltas GROUP BY 1, 2
+        """).fetchall()
+        print(f"heatmap from the raw log      {(time.perf_counter() - start) * 1000:9.1f} ms")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Snapshot throughput on a large library and the latency a running backup
+adds to page updates made meanwhile on another thread, as the GUI does.
+
+Run from the project root:  python benchmarks/bench_backup.py [books] [updates] [years]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup
+import database
+from generate import generate_library
+
+BASELINE_SECONDS = 3.0
+# Sleep between backup steps in the paced run
+PAUSE = 0.005
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+def write_until(stop, books, latencies):
+    """Update pages one commit at a time until ``stop`` is set"""
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        database.update_page(i % books + 1, i)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+
+def latency_line(label, latencies, seconds):
+    ordered = sorted(latencies)
+    return (f"{label:26s} {len(ordered) / seconds:8.0f} updates/s  "
+            f"p50 {percentile(ordered, 50) * 1000:6.2f} ms  p99 {percentile(ordered, 99) * 1000:6.2f} ms  "
+            f"max {(ordered[-1] if ordered else 0) * 1000:7.2f} ms")
+
+
+def main():
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    years = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "library.db")
+        generate_library(path, books, updates, years)
+        database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(path)
+        print(f"{books} books, {updates} updates over {years} years: {size / 1e6:.1f} MB")
+
+        snapshots = os.path.join(tmp, "snapshots")
+        for compress in (False, True):
+            start = time.perf_counter()
+            snapshot = backup.create_snapshot(snapshots, compress=compress)
+            elapsed = time.perf_counter() - start
+            print(f"snapshot {'gzip' if compress else 'plain'}  {elapsed:6.2f} s  "
+                  f"{size / 1e6 / elapsed:7.1f} MB/s  -> {os.path.getsize(snapshot) / 1e6:.1f} MB")
+
+        latencies, stop = [], threading.Event()
+        writer = threading.Thread(target=write_until, args=(stop, books, latencies))
+        writer.start()
+        time.sleep(BASELINE_SECONDS)
+        stop.set()
+        writer.join()
+        print(latency_line("updates, no backup", latencies, BASELINE_SECONDS))
+
+        for compress, pause in ((False, 0.0), (True, 0.0), (True, PAUSE)):
+            latencies, stop = [], threading.Event()
+            writer = threading.Thread(target=write_until, args=(stop, books, latencies))
+            writer.start()
+            start = time.perf_counter()
+            backup.create_snapshot(snapshots, compress=compress, pause=pause)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            writer.join()
+            label = f"during {'gzip' if compress else 'plain'} backup" + (", paced" if pause else "")
+            print(latency_line(label, latencies, elapsed) + f"  (backup {elapsed:.2f} s)")
+
+        start = time.perf_counter()
+        backup.restore_snapshot(snapshot, snapshot_current=False)
+        print(f"restore gzip snapshot  {time.perf_counter() - start:6.2f} s")
+        database.close_connections()
+
+
+if __name__ == "__main__":
+    main()
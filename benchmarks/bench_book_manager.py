@@ -0,0 +1,43 @@
+"""Per-update cost of BookManager as the number of books grows.
+
+Run from the project root:  python benchmarks/bench_book_manager.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_manager import BookManager
+
+SIZES = (100, 1000, 10000, 100000)
+UPDATES = 2000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            path = os.path.join(tmp, f"storage_{size}.json")
+            with open(path, "w") as f:
+                json.dump([{"title": f"Book {i}", "total_pages": 300, "last_page": 0}
+                           for i in range(size)], f)
+
+            start = time.perf_counter()
+            manager = BookManager(path)
+            load = time.perf_counter() - start
+
+            # Touch the last books so a linear scan would have to walk the list
+            start = time.perf_counter()
+            for i in range(UPDATES):
+                manager.update_page(f"Book {size - 1 - i % 10}", i % 300)
+            per_update = (time.perf_counter() - start) / UPDATES
+            manager.close()
+
+            print(f"{size:7d} books  load {load * 1000:8.1f} ms  "
+                  f"update {per_update * 1e6:8.1f} us (incl. compaction)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Throughput of bulk inserts and imports against one-call-per-row writes.
+
+Run from the project root:  python benchmarks/bench_bulk_import.py [rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import importers
+
+PER_CALL_ROWS = 5000
+
+
+def rate(rows, func):
+    start = time.perf_counter()
+    func()
+    return rows / (time.perf_counter() - start)
+
+
+def fresh_db(tmp, name):
+    database.set_db_path(os.path.join(tmp, name))
+    database.init_db()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = os.path.join(tmp, "storage.json")
+        with open(storage, "w") as f:
+            json.dump([{"title": f"Book {i}", "total_pages": 300, "last_page": i % 300}
+                       for i in range(rows)], f, indent=2)
+        history = os.path.join(tmp, "history.csv")
+        with open(history, "w") as f:
+            f.write("Book ID,Page,Timestamp\n")
+            for i in range(rows):
+                f.write(f"{i % 1000 + 1},{i % 300},2024-01-01T{i % 24:02d}:00:00\n")
+
+        fresh_db(tmp, "per_call.db")
+        results[f"add_book x{PER_CALL_ROWS}"] = rate(PER_CALL_ROWS, lambda: [
+            database.add_book(f"Book {i}", 300) for i in range(PER_CALL_ROWS)])
+        results[f"update_page x{PER_CALL_ROWS}"] = rate(PER_CALL_ROWS, lambda: [
+            database.update_page(i % 1000 + 1, i % 300) for i in range(PER_CALL_ROWS)])
+
+        fresh_db(tmp, "bulk.db")
+        results[f"add_books_bulk x{rows}"] = rate(rows, lambda: database.add_books_bulk(
+            (f"Book {i}", 300) for i in range(rows)))
+        results[f"update_pages_bulk x{rows}"] = rate(rows, lambda: database.update_pages_bulk(
+            (i % 1000 + 1, i % 300) for i in range(rows)))
+
+        fresh_db(tmp, "import.db")
+        results[f"import_books storage.json x{rows}"] = rate(
+            rows, lambda: importers.import_books(storage))
+        results[f"import_updates csv x{rows}"] = rate(
+            rows, lambda: importers.import_updates(history))
+        database.close_connections()
+
+    for name, value in results.items():
+        print(f"{name:40s} {value:12.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Startup time and update throughput of the CLI against the GUI path.
+
+Startup compares `python -m bookkeeper list` with importing the GUI (the
+part of the GUI start that needs no display). Throughput compares streaming
+updates into the CLI with one update_page call per update, which is what the
+GUI's Update Progress button amounts to.
+
+Run from the project root:  python benchmarks/bench_cli.py [updates]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+
+BOOKS = 1000
+RUNS = 5
+
+
+def best_run(command, stdin=None):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(command, input=stdin, env=env, check=True, text=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cli.db")
+        database.set_db_path(path)
+        database.init_db()
+        database.add_books_bulk((f"Book {i}", 500) for i in range(BOOKS))
+
+        cli = best_run([sys.executable, "-m", "bookkeeper", "--db", path, "list", "--limit", "10"])
+        gui = best_run([sys.executable, "-c", "import gui"])
+        print(f"startup: CLI list {cli * 1000:7.1f} ms, GUI imports alone {gui * 1000:7.1f} ms")
+
+        lines = "".join(f"{i % BOOKS + 1},{i % 500}\n" for i in range(updates))
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "bookkeeper", "--db", path, "update", "--stdin"],
+                       input=lines, env=dict(os.environ, PYTHONPATH=ROOT), check=True, text=True,
+                       stdout=subprocess.DEVNULL)
+        batched = updates / (time.perf_counter() - start)
+
+        per_call_updates = min(updates, 5000)
+        start = time.perf_counter()
+        for i in range(per_call_updates):
+            database.update_page(i % BOOKS + 1, i % 500)
+        per_call = per_call_updates / (time.perf_counter() - start)
+        database.close_connections()
+
+    print(f"throughput: CLI --stdin {batched:9.0f} updates/s (incl. startup), "
+          f"update_page per call {per_call:9.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
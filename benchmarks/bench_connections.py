@@ -0,0 +1,71 @@
+"""Compare pooled connections against the old connect-per-call behaviour.
+
+Run from the project root:  python benchmarks/bench_connections.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+OPS = 2000
+BOOKS = 200
+
+
+def legacy_update_page(path, book_id, page):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("UPDATE books SET current_page=? WHERE id=?", (page, book_id))
+    c.execute("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
+              (book_id, page, datetime.now().isoformat()))
+    conn.commit()
+    conn.close()
+
+
+def legacy_get_books(path):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("SELECT * FROM books")
+    books = c.fetchall()
+    conn.close()
+    return books
+
+
+def ops_per_sec(func, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        database.set_db_path(path)
+        database.init_db()
+        for i in range(BOOKS):
+            database.add_book(f"Book {i}", 300)
+
+        results = {
+            "update_page (connect per call)":
+                ops_per_sec(lambda i: legacy_update_page(path, i % BOOKS + 1, i % 300), OPS),
+            "update_page (pooled)":
+                ops_per_sec(lambda i: database.update_page(i % BOOKS + 1, i % 300), OPS),
+            "get_books (connect per call)":
+                ops_per_sec(lambda i: legacy_get_books(path), OPS),
+            "get_books (pooled)":
+                ops_per_sec(lambda i: database.get_books(), OPS),
+        }
+        database.close_connections()
+
+    for name, value in results.items():
+        print(f"{name:34s} {value:10.0f} ops/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Title search latency as each keystroke of a query is typed.
+
+Run from the project root:  python benchmarks/bench_search.py [books]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+WORDS = ("river", "shadow", "garden", "empire", "silent", "winter", "stone", "queen",
+         "machine", "ocean", "forgotten", "iron", "crimson", "voyage", "library",
+         "summer", "night", "glass", "harbor", "legend", "atlas", "echo", "orchard")
+QUERIES = ("forgotten empire", "crimson harbor", "the silent queen", "voyage", "glass orchard")
+
+
+def titles(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.sample(WORDS, rng.randint(2, 4))
+        yield (" ".join(words).title() + f" {i}", rng.randint(80, 1200), rng.randint(0, 80))
+
+
+def main():
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_db_path(os.path.join(tmp, "search.db"))
+        database.init_db()
+        database.add_books_bulk(titles(books))
+
+        timings = []
+        for book_filter in (database.ALL_BOOKS, database.UNFINISHED, database.RECENT):
+            for query in QUERIES:
+                for end in range(1, len(query) + 1):
+                    start = time.perf_counter()
+                    database.search_books(query[:end], book_filter)
+                    timings.append(time.perf_counter() - start)
+        database.close_connections()
+
+    timings.sort()
+    print(f"{books} books, {len(timings)} keystrokes")
+    for p in (50, 95, 99, 100):
+        value = timings[min(len(timings) - 1, int(p / 100 * len(timings)))]
+        print(f"p{p:<3d} {value * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
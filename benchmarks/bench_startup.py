@@ -0,0 +1,92 @@
+"""Time-to-first-paint and time-to-interactive of the desktop app.
+
+Each run starts a fresh interpreter that follows main.py step by step and
+reports wall-clock times back: first paint is when the empty window has been
+drawn, interactive is when the first page of books is on screen.
+
+Run from the project root:  python benchmarks/bench_startup.py [runs] [books]
+
+Needs a display; without one it starts Xvfb if it is installed.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate import generate_library
+from run import ensure_display
+
+# Seconds one startup may take before the run is abandoned
+RUN_TIMEOUT = 120
+
+PROBE = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from tkinter import Tk
+root = Tk()
+root.title("BookKeeper")
+root.geometry("500x700")
+root.configure(bg="#1a2332")
+root.update()
+first_paint = time.time()
+
+import database
+database.set_db_path(sys.argv[2])
+from gui import BookKeeperApp
+show_books = BookKeeperApp.show_books
+
+def probe(app, result):
+    show_books(app, result)
+    root.update()
+    print(json.dumps({"first_paint": first_paint, "interactive": time.time()}), flush=True)
+    app.on_close()
+
+# Patched on the class: __init__ already queues show_books for the first page
+BookKeeperApp.show_books = probe
+app = BookKeeperApp(root)
+root.mainloop()
+"""
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    books = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    xvfb = ensure_display()
+    if xvfb is False:
+        print("no display and no Xvfb: cannot measure startup")
+        return 1
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "startup.db")
+            generate_library(path, books, books * 10)
+            paints, interactive = [], []
+            for _ in range(runs):
+                started = time.time()
+                try:
+                    output = subprocess.run([sys.executable, "-c", PROBE, ROOT, path],
+                                            capture_output=True, text=True, check=True,
+                                            timeout=RUN_TIMEOUT).stdout
+                except subprocess.TimeoutExpired:
+                    print(f"the app did not show its books within {RUN_TIMEOUT} s")
+                    return 1
+                stamps = json.loads(output.strip().splitlines()[-1])
+                paints.append(stamps["first_paint"] - started)
+                interactive.append(stamps["interactive"] - started)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+
+    print(f"{books} books, {runs} runs (best / median)")
+    for name, values in (("time to first paint", paints), ("time to interactive", interactive)):
+        values.sort()
+        print(f"{name:22s} {values[0] * 1000:8.1f} ms {values[len(values) // 2] * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Time the weekly stats query on a large updates table.
+
+Compares the indexed range scan in database.get_weekly_stats against the old
+date(timestamp) filter, and checks that the query plan uses the timestamp index.
+
+Run from the project root:  python benchmarks/bench_time_queries.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+BOOKS = 1000
+YEARS = 3
+
+LEGACY_QUERY = """
+    SELECT book_id, page, timestamp FROM updates
+    WHERE date(timestamp) >= date('now', '-7 day')
+"""
+
+
+def generate_updates(rows):
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365 * YEARS)
+    span = 365 * YEARS * 86400
+    for _ in range(rows):
+        moment = start + timedelta(seconds=rng.randrange(span))
+        yield (rng.randrange(1, BOOKS + 1), rng.randrange(1, 500),
+               moment.isoformat(timespec="seconds"))
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_db_path(os.path.join(tmp, "bench.db"))
+        database.init_db()
+        conn = database.get_connection()
+        with conn:
+            conn.executemany("INSERT INTO books (title, total_pages) VALUES (?, ?)",
+                             ((f"Book {i}", 500) for i in range(BOOKS)))
+            conn.executemany("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
+                             generate_updates(rows))
+        conn.execute("ANALYZE")
+
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT book_id, page, timestamp "
+                            "FROM updates WHERE timestamp >= ?",
+                            (database.days_ago(7),)).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        assert "USING INDEX idx_updates_timestamp" in details, details
+        print(f"plan: {details}")
+
+        matched = len(database.get_weekly_stats())
+        indexed = best_of(database.get_weekly_stats)
+        legacy = best_of(lambda: conn.execute(LEGACY_QUERY).fetchall())
+        database.close_connections()
+
+    print(f"{rows} updates, {matched} in the last week")
+    print(f"date(timestamp) filter   {legacy * 1000:10.2f} ms")
+    print(f"indexed range scan       {indexed * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Page update throughput, direct and through the write buffer, per durability mode.
+
+Run from the project root:  python benchmarks/bench_write_buffer.py [updates]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from write_buffer import WriteBuffer
+
+BOOKS = 1000
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(0)
+    work = [(rng.randrange(1, BOOKS + 1), rng.randrange(1, 500)) for _ in range(updates)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in database.DURABILITY_MODES:
+            database.set_db_path(os.path.join(tmp, f"{mode}.db"))
+            database.init_db()
+            database.add_books_bulk((f"Book {i}", 500) for i in range(BOOKS))
+
+            database.set_durability(mode)
+            start = time.perf_counter()
+            for book_id, page in work:
+                database.update_page(book_id, page)
+            direct = updates / (time.perf_counter() - start)
+
+            buffer = WriteBuffer(durability=mode)
+            start = time.perf_counter()
+            for book_id, page in work:
+                buffer.update_page(book_id, page)
+            buffer.close()
+            buffered = updates / (time.perf_counter() - start)
+            database.close_connections()
+
+            print(f"synchronous={database.DURABILITY_MODES[mode]:6s} "
+                  f"direct {direct:10.0f} updates/s   buffered {buffered:10.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
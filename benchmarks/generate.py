@@ -0,0 +1,56 @@
+"""Deterministic synthetic libraries for benchmarks.
+
+The same (books, updates, years, seed) always produces the same books and the
+same page history, shifted so it ends on the day the benchmark runs. Timings
+from different runs and machines therefore measure the code, not the data.
+"""
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+import database
+
+
+def end_of_history():
+    """Histories end at today's midnight so "last 7 days" queries match rows"""
+    return datetime.combine(date.today(), time())
+
+
+def iter_library(books, updates, years=1, seed=0):
+    """Yield (books, updates) row generators for database.add_books_bulk/update_pages_bulk"""
+    rng = random.Random(seed)
+    totals = [rng.randint(80, 1200) for _ in range(books)]
+
+    def book_rows():
+        for i, total in enumerate(totals):
+            yield (f"Synthetic Book {i:07d}", total)
+
+    def update_rows():
+        current = [0] * books
+        start = end_of_history() - timedelta(days=365 * years)
+        step = 365 * years * 86400 / max(updates, 1)
+        for i in range(updates):
+            index = rng.randrange(books)
+            current[index] = min(totals[index], current[index] + rng.randint(1, 40))
+            moment = start + timedelta(seconds=int(i * step))
+            yield (index + 1, current[index], moment.isoformat(timespec="seconds"))
+
+    return book_rows(), update_rows()
+
+
+def generate_library(path, books, updates, years=1, seed=0):
+    """Create a fresh database at ``path`` filled with a synthetic library"""
+    database.set_db_path(path)
+    database.init_db()
+    book_rows, update_rows = iter_library(books, updates, years, seed)
+    database.add_books_bulk(book_rows)
+    database.update_pages_bulk(update_rows)
+
+
+def generate_storage_json(path, books, seed=0):
+    """Write a BookManager storage.json snapshot with ``books`` entries"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        json.dump([{"title": f"Synthetic Book {i:07d}",
+                    "total_pages": rng.randint(80, 1200),
+                    "last_page": 0} for i in range(books)], f, indent=2)
@@ -0,0 +1,213 @@
+"""Benchmark suite for BookKeeper.
+
+Times the database API, exports, BookManager and the book list widgets
+against synthetic libraries at several scales and writes the results as JSON.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --scale 1000x20000 --scale 50000x2000000 --years 5
+    python benchmarks/run.py --compare baseline.json --threshold 0.25
+
+With --compare the run fails (exit status 1) if any metric is slower than the
+baseline by more than the threshold. The GUI benchmark needs a display; when
+none is set it starts Xvfb if it is installed and is skipped otherwise.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+import utils
+from analytics import ReadingAnalytics
+from book_manager import BookManager
+from generate import generate_library, generate_storage_json
+
+DEFAULT_SCALES = ("1000x20000", "10000x200000")
+SINGLE_OPS = 500
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def per_op(func, ops=SINGLE_OPS):
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    return (time.perf_counter() - start) / ops
+
+
+def bench_database(tmp, books, updates, years):
+    metrics = {}
+    path = os.path.join(tmp, f"library_{books}_{updates}.db")
+
+    database.set_db_path(os.path.join(tmp, f"empty_{books}_{updates}.db"))
+    metrics["init_db (new file)"] = best_of(database.init_db, repeat=1)
+    metrics["init_db (up to date)"] = best_of(database.init_db)
+
+    start = time.perf_counter()
+    generate_library(path, books, updates, years)
+    metrics["generate library"] = time.perf_counter() - start
+
+    metrics["get_books"] = best_of(database.get_books)
+    metrics["get_weekly_stats"] = best_of(database.get_weekly_stats)
+    metrics["analytics (full load)"] = best_of(
+        lambda: ReadingAnalytics().book_stats(), repeat=3)
+    metrics["update_page"] = per_op(lambda i: database.update_page(i % books + 1, i))
+    metrics["add_book"] = per_op(lambda i: database.add_book(f"Added {i}", 300))
+
+    export_path = os.path.join(tmp, "stats.csv")
+    metrics["export_stats (last 7 days)"] = best_of(
+        lambda: utils.export_stats(export_path, start=database.days_ago(7)), repeat=3)
+    metrics["export_stats (full history)"] = best_of(
+        lambda: utils.export_stats(export_path), repeat=1)
+    database.close_connections()
+    return metrics
+
+
+def bench_book_manager(tmp, books):
+    path = os.path.join(tmp, f"storage_{books}.json")
+    generate_storage_json(path, books)
+    manager = BookManager(path)
+    metrics = {
+        "BookManager load": best_of(lambda: BookManager(path).close()),
+        "BookManager save": best_of(manager.save_books),
+        "BookManager update_page": per_op(
+            lambda i: manager.update_page(f"Synthetic Book {i % books:07d}", i)),
+    }
+    manager.close()
+    return metrics
+
+
+def ensure_display():
+    """Return a running Xvfb process if one had to be started, False if unavailable"""
+    if os.environ.get("DISPLAY"):
+        return None
+    if not shutil.which("Xvfb"):
+        return False
+    display = ":97"
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1024x768x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def bench_gui(books, updates):
+    import tkinter as tk
+    from gui import BookKeeperApp
+
+    root = tk.Tk()
+    try:
+        app = BookKeeperApp(root)
+        root.update()
+        rows = database.get_books()
+
+        def build():
+            app.show_books((rows, None))
+            root.update()
+
+        metrics = {"refresh_books widgets": best_of(build),
+                   "book row widgets": float(len(app.rows))}
+        app.writes.close()
+        app.db.stop()
+        return metrics
+    finally:
+        root.destroy()
+
+
+def run(scales, years):
+    results = {}
+    xvfb = ensure_display()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for scale in scales:
+                books, updates = (int(n) for n in scale.split("x"))
+                print(f"scale {scale} ...", file=sys.stderr)
+                metrics = bench_database(tmp, books, updates, years)
+                metrics.update(bench_book_manager(tmp, books))
+                if xvfb is not False:
+                    database.set_db_path(os.path.join(tmp, f"library_{books}_{updates}.db"))
+                    metrics.update(bench_gui(books, updates))
+                    database.close_connections()
+                for name, value in metrics.items():
+                    results[f"{name} [{scale}]"] = value
+    finally:
+        if xvfb:
+            xvfb.terminate()
+    if xvfb is False:
+        print("no display and no Xvfb: GUI benchmarks skipped", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return the names of regressed metrics"""
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None or base <= 0:
+            print(f"{name:55s} {value:12.6f}   (no baseline)")
+            continue
+        ratio = value / base
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:55s} {value:12.6f} {ratio:7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", action="append",
+                        help="BOOKSxUPDATES, may be repeated (default: %s)" % ", ".join(DEFAULT_SCALES))
+    parser.add_argument("--years", type=int, default=2, help="years of history to spread updates over")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a metric counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    metrics = run(args.scale or DEFAULT_SCALES, args.years)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(metrics, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    else:
+        for name, value in metrics.items():
+            print(f"{name:55s} {value:12.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
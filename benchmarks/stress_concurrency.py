@@ -0,0 +1,178 @@
+"""Several writer and reader processes sharing one database file.
+
+Writers log page updates through database.update_page, and when --batch is
+given every other writer syncs batches through update_pages_bulk instead.
+Readers page through the book list and the stats for as long as the writers
+run. Afterwards every update must be in the log and each book's current page
+must match its newest update; any loss makes the script exit with status 1.
+
+Run from the project root:
+    python benchmarks/stress_concurrency.py --writers 4 --readers 4 --updates 500
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import metrics
+
+BOOKS = 50
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+def run_child(target, results, path, durability, *args):
+    """Process entry point; reports an exception instead of leaving the parent waiting"""
+    database.set_db_path(path)
+    database.set_durability(durability)
+    try:
+        target(*args, results)
+    except BaseException as e:
+        results.put((target.__name__, repr(e), [], 0))
+        raise
+
+
+def writer(number, updates, batch, start, results):
+    rng = random.Random(number)
+    # Pages are unique across writers so every update can be found afterwards
+    work = [(rng.randrange(1, BOOKS + 1), number * updates + i + 1) for i in range(updates)]
+    latencies = []
+    start.wait()
+    if batch:
+        for chunk in database.chunked(work, batch):
+            t = time.perf_counter()
+            database.update_pages_bulk(chunk)
+            latencies.append(time.perf_counter() - t)
+    else:
+        for book_id, page in work:
+            t = time.perf_counter()
+            database.update_page(book_id, page)
+            latencies.append(time.perf_counter() - t)
+    counters = metrics.snapshot()["counters"]
+    results.put(("writer", work, latencies, counters.get("sql.write_retries", 0)))
+
+
+def reader(start, done, results):
+    queries = (
+        lambda: database.get_books_page(database.SORT_PROGRESS, True),
+        lambda: database.count_updates(),
+        lambda: database.get_daily_stats(database.days_ago(7)),
+    )
+    latencies = []
+    start.wait()
+    while not done.is_set():
+        for query in queries:
+            t = time.perf_counter()
+            query()
+            latencies.append(time.perf_counter() - t)
+    results.put(("reader", None, latencies, 0))
+
+
+def verify(path, written):
+    """Return a list of problems: missing updates or stale current pages"""
+    database.set_db_path(path)
+    conn = database.get_connection()
+    problems = []
+    logged = set(conn.execute("SELECT book_id, page FROM updates"))
+    missing = [row for row in written if row not in logged]
+    if missing:
+        problems.append(f"{len(missing)} of {len(written)} updates missing from the log")
+    if len(logged) != len(written):
+        problems.append(f"log holds {len(logged)} updates, {len(written)} were written")
+    stale = conn.execute("""
+        SELECT COUNT(*) FROM books b
+        JOIN updates u ON u.id = (SELECT MAX(id) FROM updates WHERE book_id = b.id)
+        WHERE b.current_page != u.page
+    """).fetchone()[0]
+    if stale:
+        problems.append(f"{stale} books whose current page is not their newest update")
+    database.close_connections()
+    return problems
+
+
+def report(label, latencies, ops, elapsed):
+    ordered = sorted(latencies)
+    print(f"{label:8s} {ops:8d} ops  {ops / elapsed if elapsed else 0:10.0f} ops/s   "
+          f"p50 {percentile(ordered, 50) * 1000:7.2f} ms  p99 {percentile(ordered, 99) * 1000:7.2f} ms  "
+          f"max {(ordered[-1] if ordered else 0) * 1000:7.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=500, help="updates per writer")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="rows per update_pages_bulk call for every other writer")
+    parser.add_argument("--durability", choices=sorted(database.DURABILITY_MODES), default="normal")
+    args = parser.parse_args(argv)
+
+    database.set_durability(args.durability)
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stress.db")
+        database.set_db_path(path)
+        database.init_db()
+        database.add_books_bulk((f"Book {i}", 100000) for i in range(BOOKS))
+        database.close_connections()
+
+        start, done = context.Event(), context.Event()
+        results = context.Queue()
+        writers = [context.Process(target=run_child, args=(writer, results, path, args.durability, n,
+                                                        args.updates, args.batch if n % 2 else 0, start))
+                   for n in range(args.writers)]
+        readers = [context.Process(target=run_child, args=(reader, results, path, args.durability, start, done))
+                   for _ in range(args.readers)]
+        for process in writers + readers:
+            process.start()
+        began = time.perf_counter()
+        start.set()
+
+        # Each process sends one message; failures carry the exception text
+        written, write_latencies, read_latencies, errors = [], [], [], []
+        retries, writers_left = 0, len(writers)
+        writes_elapsed = 0.0
+        for _ in writers + readers:
+            kind, payload, latencies, write_retries = results.get()
+            if kind == "writer":
+                writers_left -= 1
+                if isinstance(payload, str):
+                    errors.append(payload)
+                else:
+                    written.extend(payload)
+                    write_latencies.extend(latencies)
+                    retries += write_retries
+                if not writers_left:
+                    writes_elapsed = time.perf_counter() - began
+                    done.set()
+            elif isinstance(payload, str):
+                errors.append(payload)
+            else:
+                read_latencies.extend(latencies)
+        reads_elapsed = time.perf_counter() - began
+        for process in writers + readers:
+            process.join()
+
+        print(f"{args.writers} writers, {args.readers} readers, {BOOKS} books, "
+              f"synchronous={database.DURABILITY_MODES[args.durability]}")
+        report("writes", write_latencies, len(written), writes_elapsed)
+        report("reads", read_latencies, len(read_latencies), reads_elapsed)
+        print(f"write lock retries: {retries}")
+
+        problems = verify(path, written) + [f"process failed: {error}" for error in errors]
+        for problem in problems:
+            print("LOST:", problem)
+        print("no lost updates" if not problems else "FAILED")
+        return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,115 @@
 import json
 import os
 
+JOURNAL_SUFFIX = '.journal'
+
 class BookManager:
-    def __init__(self, filename='storage.json'):
+    """JSON-file book store kept as a snapshot plus an append-only journal.
+
+    Each change is appended as one JSON line to ``<filename>.journal``. Once
+    the journal holds ``compact_every`` entries, or as many entries as there
+    are books if that is more, the books are rewritten to ``filename`` and the
+    journal is emptied, so the amortized cost of a change does not grow with
+    the library. Loading replays the journal over the snapshot and
+    drops a torn last line left behind by a crash.
+    """
+
+    def __init__(self, filename='storage.json', compact_every=1000):
         self.filename = filename
+        self.journal_filename = filename + JOURNAL_SUFFIX
+        self.compact_every = compact_every
+        self.journal = None
+        self.journal_entries = 0
         self.books = self.load_books()
+        self.index = {book['title']: book for book in self.books}
 
     def load_books(self):
+        books = []
         if os.path.exists(self.filename):
             with open(self.filename, 'r') as f:
-                return json.load(f)
-        return []
+                content = f.read()
+            if content.strip():
+                books = json.loads(content)
+        index = {book['title']: book for book in books}
+        self.journal_entries = 0
+        if os.path.exists(self.journal_filename):
+            for entry in self.read_journal():
+                self.apply(books, index, entry)
+                self.journal_entries += 1
+        return books
+
+    def read_journal(self):
+        """Return journal entries, truncating an incomplete final line"""
+        entries = []
+        good_offset = 0
+        with open(self.journal_filename, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("torn journal line")
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+            torn = f.seek(0, os.SEEK_END) != good_offset
+        if torn:
+            with open(self.journal_filename, 'r+b') as f:
+                f.truncate(good_offset)
+        return entries
+
+    @staticmethod
+    def apply(books, index, entry):
+        title = entry['title']
+        if entry['op'] == 'add':
+            if title not in index:
+                book = {
+                    'title': title,
+                    'total_pages': entry['total_pages'],
+                    'last_page': 0
+                }
+                books.append(book)
+                index[title] = book
+        elif entry['op'] == 'page':
+            if title in index:
+                index[title]['last_page'] = entry['page']
+
+    def append_journal(self, entry):
+        if self.journal is None:
+            self.journal = open(self.journal_filename, 'a')
+        self.journal.write(json.dumps(entry) + '\n')
+        self.journal.flush()
+        self.journal_entries += 1
+        if self.journal_entries >= max(self.compact_every, len(self.books)):
+            self.save_books()
 
     def save_books(self):
-        with open(self.filename, 'w') as f:
+        """Write a full snapshot atomically and start a fresh journal"""
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
             json.dump(self.books, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_filename, 'w')
+        self.journal_entries = 0
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
 
     def add_book(self, title, total_pages):
-        for book in self.books:
-            if book['title'] == title:
-                return  # Avoid duplicates
-        self.books.append({
-            'title': title,
-            'total_pages': total_pages,
-            'last_page': 0
-        })
-        self.save_books()
+        if title in self.index:
+            return  # Avoid duplicates
+        entry = {'op': 'add', 'title': title, 'total_pages': total_pages}
+        self.apply(self.books, self.index, entry)
+        self.append_journal(entry)
 
     def update_page(self, title, page):
-        for book in self.books:
-            if book['title'] == title:
-                book['last_page'] = page
-                break
-        self.save_books()
+        if title not in self.index:
+            return
+        entry = {'op': 'page', 'title': title, 'page': page}
+        self.apply(self.books, self.index, entry)
+        self.append_journal(entry)
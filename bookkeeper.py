@@ -0,0 +1,244 @@
+"""Command-line interface to the BookKeeper database, without the GUI.
+
+    python -m bookkeeper add "The Pragmatic Programmer" 352
+    python -m bookkeeper update 3 120
+    python -m bookkeeper update --stdin < updates.csv     # book_id,page per line
+    python -m bookkeeper list --sort progress --format csv
+    python -m bookkeeper stats --period daily --start 2024-01-01
+    python -m bookkeeper analytics books --format csv
+    python -m bookkeeper export stats.csv.gz --gzip
+    python -m bookkeeper import books storage.json
+    python -m bookkeeper backup --keep 7
+    python -m bookkeeper restore backups/books-20240101-120000-000000.db.gz
+
+Output is JSON by default or CSV with --format csv. Nothing here imports
+tkinter, so it starts quickly enough for scripts and cron jobs.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import database
+
+BATCH_SIZE = 1000
+
+
+def write_rows(header, rows, output_format, out=None):
+    out = out or sys.stdout
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(header)
+        writer.writerows(rows)
+    else:
+        json.dump([dict(zip(header, row)) for row in rows], out)
+        out.write("\n")
+
+
+def write_result(result, out=None):
+    out = out or sys.stdout
+    json.dump(result, out)
+    out.write("\n")
+
+
+def iter_stdin_updates(lines):
+    """Parse ``book_id,page`` lines, skipping blanks, comments and a header.
+
+    Raises ValueError naming the line number of the first malformed line.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(",")
+        if number == 1 and not fields[0].strip().isdigit():
+            continue
+        try:
+            yield (int(fields[0]), int(fields[1]))
+        except (ValueError, IndexError):
+            raise ValueError(f"line {number}: expected book_id,page, got {line!r}")
+
+
+def cmd_add(args):
+    write_result({"id": database.add_book(args.title, args.total_pages)})
+
+
+def cmd_update(args):
+    if not args.stdin:
+        if args.book_id is None or args.page is None:
+            raise SystemExit("update needs BOOK_ID PAGE or --stdin")
+        if not database.update_page(args.book_id, args.page):
+            raise SystemExit(f"no book with id {args.book_id}")
+        write_result({"updated": 1})
+        return
+    # One transaction per batch, so a long stream commits as it goes
+    total = read = 0
+    try:
+        for batch in database.chunked(iter_stdin_updates(sys.stdin), args.batch_size):
+            read += len(batch)
+            total += database.update_pages_bulk(batch, args.batch_size)
+    except ValueError as e:
+        raise SystemExit(f"{e}; {total} updates before it were applied")
+    write_result({"updated": total, "unknown_books": read - total})
+    if read != total:
+        raise SystemExit(f"{read - total} updates named books that do not exist")
+
+
+def cmd_list(args):
+    header = ("id", "title", "total_pages", "current_page")
+    rows, cursor = [], None
+    while True:
+        page, cursor = database.search_books(args.search or "", args.filter, args.sort,
+                                             args.descending, cursor)
+        rows.extend(page)
+        if cursor is None or len(rows) >= args.limit:
+            break
+    write_rows(header, rows[:args.limit], args.format)
+
+
+def cmd_stats(args):
+    if args.period == "raw":
+        header = ("book_id", "page", "timestamp")
+        rows = [row for chunk in database.iter_updates(args.start, args.end) for row in chunk]
+    else:
+        queries = {
+            "daily": ("day", database.get_daily_stats),
+            "weekly": ("week", database.get_weekly_totals),
+            "monthly": ("month", database.get_monthly_totals),
+        }
+        key, query = queries[args.period]
+        header = (key, "book_id", "pages_read", "sessions")
+        rows = query(args.start, args.end)
+    write_rows(header, rows, args.format)
+
+
+def cmd_analytics(args):
+    from analytics import VELOCITY_DAYS, ReadingAnalytics
+    analytics = ReadingAnalytics(args.days or VELOCITY_DAYS)
+    if args.report == "streaks":
+        write_result(analytics.streaks())
+    elif args.report == "books":
+        header = ("book_id", "pages_read", "reading_days", "pages_per_day", "velocity",
+                  "remaining", "eta")
+        write_rows(header, analytics.book_stats(), args.format)
+    elif args.report == "velocity":
+        write_rows(("day", "pages_read", "velocity"), analytics.rolling_velocity(), args.format)
+    else:
+        write_rows(("weekday", "hour", "pages_read", "sessions"), analytics.heatmap(), args.format)
+
+
+def cmd_export(args):
+    from utils import export_stats
+    rows = export_stats(args.path, start=args.start, end=args.end,
+                        compress=args.gzip, daily=args.daily)
+    write_result({"exported": rows, "path": args.path})
+
+
+def cmd_import(args):
+    import importers
+    if args.kind == "books":
+        count = importers.import_books(args.path, args.batch_size)
+    else:
+        count = importers.import_updates(args.path, args.batch_size)
+    write_result({"imported": count})
+
+
+def cmd_backup(args):
+    import backup
+    path = backup.create_snapshot(args.dir, compress=not args.no_gzip)
+    removed = backup.rotate_snapshots(args.dir, args.keep) if args.keep else []
+    write_result({"snapshot": path, "bytes": os.path.getsize(path), "removed": removed})
+
+
+def cmd_restore(args):
+    import backup
+    previous = backup.restore_snapshot(args.path, snapshot_current=not args.no_snapshot)
+    database.init_db()
+    write_result({"restored": args.path, "previous": previous})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bookkeeper", description="BookKeeper command line")
+    parser.add_argument("--db", default=database.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--durability", choices=list(database.DURABILITY_MODES),
+                        help="PRAGMA synchronous mode for writes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a book")
+    add.add_argument("title")
+    add.add_argument("total_pages", type=int)
+    add.set_defaults(func=cmd_add)
+
+    update = commands.add_parser("update", help="record the current page of a book")
+    update.add_argument("book_id", type=int, nargs="?")
+    update.add_argument("page", type=int, nargs="?")
+    update.add_argument("--stdin", action="store_true", help="read book_id,page lines from stdin")
+    update.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    update.set_defaults(func=cmd_update)
+
+    list_ = commands.add_parser("list", help="list books")
+    list_.add_argument("--sort", choices=database.SORT_KEYS, default=database.SORT_TITLE)
+    list_.add_argument("--descending", action="store_true")
+    list_.add_argument("--search", help="title words to match as prefixes")
+    list_.add_argument("--filter", choices=[database.ALL_BOOKS, database.UNFINISHED,
+                                            database.FINISHED, database.RECENT],
+                       default=database.ALL_BOOKS)
+    list_.add_argument("--limit", type=int, default=sys.maxsize)
+    list_.set_defaults(func=cmd_list)
+
+    stats = commands.add_parser("stats", help="reading statistics")
+    stats.add_argument("--period", choices=("raw", "daily", "weekly", "monthly"), default="daily")
+    stats.add_argument("--start", help="first day (YYYY-MM-DD), inclusive")
+    stats.add_argument("--end", help="last day (YYYY-MM-DD), exclusive")
+    stats.set_defaults(func=cmd_stats)
+
+    analytics = commands.add_parser("analytics", help="reading pace, finish dates, streaks and heatmaps")
+    analytics.add_argument("report", choices=("books", "velocity", "streaks", "heatmap"))
+    analytics.add_argument("--days", type=int, help="days behind the velocity figures (default: 14)")
+    analytics.set_defaults(func=cmd_analytics)
+
+    export = commands.add_parser("export", help="export stats to a CSV file")
+    export.add_argument("path")
+    export.add_argument("--start")
+    export.add_argument("--end")
+    export.add_argument("--gzip", action="store_true")
+    export.add_argument("--daily", action="store_true", help="export the daily rollup")
+    export.set_defaults(func=cmd_export)
+
+    import_ = commands.add_parser("import", help="import books or page history from CSV/JSON")
+    import_.add_argument("kind", choices=("books", "updates"))
+    import_.add_argument("path")
+    import_.add_argument("--batch-size", type=int, default=5000)
+    import_.set_defaults(func=cmd_import)
+
+    backup = commands.add_parser("backup", help="write a compressed, checksummed snapshot")
+    backup.add_argument("--dir", default="backups", help="snapshot folder (default: %(default)s)")
+    backup.add_argument("--keep", type=int, default=7,
+                        help="newest snapshots to keep, 0 for all (default: %(default)s)")
+    backup.add_argument("--no-gzip", action="store_true")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = commands.add_parser("restore", help="replace the database with a snapshot")
+    restore.add_argument("path")
+    restore.add_argument("--no-snapshot", action="store_true",
+                         help="skip the snapshot of the current database taken first")
+    restore.set_defaults(func=cmd_restore)
+
+    for command in (list_, stats, analytics):
+        command.add_argument("--format", choices=("json", "csv"), default="json")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    database.set_db_path(args.db)
+    if args.durability:
+        database.set_durability(args.durability)
+    database.init_db()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
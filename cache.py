@@ -0,0 +1,152 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+import database
+import metrics
+
+
+class BookTable:
+    """The books table held as parallel arrays instead of one tuple per row.
+
+    ``rows`` builds a fresh list on every call, so callers may change what
+    they get without touching the cached copy.
+    """
+
+    __slots__ = ("ids", "titles", "total_pages", "current_pages")
+
+    def __init__(self, rows):
+        self.ids = array("q")
+        self.titles = []
+        self.total_pages = array("q")
+        self.current_pages = array("q")
+        for row in rows:
+            self.append(row)
+
+    def append(self, row):
+        book_id, title, total_pages, current_page = row
+        self.ids.append(book_id)
+        self.titles.append(title)
+        self.total_pages.append(total_pages)
+        self.current_pages.append(current_page or 0)
+
+    def rows(self):
+        """Rows shaped like ``database.get_books``"""
+        return list(zip(self.ids, self.titles, self.total_pages, self.current_pages))
+
+
+def pack_page(result):
+    rows, cursor = result
+    return BookTable(rows), cursor
+
+
+def unpack_page(packed):
+    table, cursor = packed
+    return table.rows(), cursor
+
+
+class ReadCache:
+    """Read-through cache in front of ``database``.
+
+    Pages of books are memoized in an LRU of at most ``max_entries``
+    results, each tagged with the tables it reads and stored as a
+    ``BookTable``. Every read returns a new list, so callers can never
+    change a cached result. Writes made through this object drop only the
+    results that read a written table, and a ``WriteBuffer`` reports its
+    flushes to ``flushed`` so they are dropped as soon as they commit.
+    Commits from any other connection, whether another thread or another
+    process, are caught by comparing ``PRAGMA data_version`` before each
+    read, which empties the cache. Writes made directly through
+    ``database`` on the same thread as the reads bypass both checks, so
+    route them through here.
+    """
+
+    # Tables each cached query reads
+    QUERIES = {
+        "get_books_page": ("books",),
+        "search_books": ("books", "updates"),
+    }
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.results = OrderedDict()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def check_data_version(self):
+        conn = database.get_connection()
+        # Versions are only comparable on one connection, so a thread that
+        # reconnected compares its new connection against nothing
+        version = (conn, conn.execute("PRAGMA data_version").fetchone()[0])
+        last = getattr(self.local, "data_version", None)
+        self.local.data_version = version
+        # A thread's first check has nothing to compare against, so anything
+        # cached by other threads is dropped rather than trusted
+        if last != version:
+            self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.invalidations += 1
+
+    def invalidate(self, *tables):
+        with self.lock:
+            for key in [key for key, (reads, _) in self.results.items()
+                        if any(table in reads for table in tables)]:
+                del self.results[key]
+            self.invalidations += 1
+
+    def count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if metrics.ENABLED:
+            metrics.increment("cache.hits" if hit else "cache.misses")
+
+    def query(self, name, *args):
+        self.check_data_version()
+        key = (name,) + args
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None:
+                self.results.move_to_end(key)
+                self.count(True)
+                return unpack_page(entry[1])
+        self.count(False)
+        packed = pack_page(getattr(database, name)(*args))
+        with self.lock:
+            self.results[key] = (self.QUERIES[name], packed)
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+        return unpack_page(packed)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "invalidations": self.invalidations, "entries": len(self.results)}
+
+    # Reads
+
+    def get_books_page(self, sort=database.SORT_TITLE, descending=False, after=None,
+                       limit=database.PAGE_SIZE):
+        return self.query("get_books_page", sort, descending, after, limit)
+
+    def search_books(self, text="", book_filter=database.ALL_BOOKS, sort=database.SORT_TITLE,
+                     descending=False, after=None, limit=database.PAGE_SIZE):
+        return self.query("search_books", text, book_filter, sort, descending, after, limit)
+
+    # Writes
+
+    def add_book(self, title, total_pages):
+        book_id = database.add_book(title, total_pages)
+        self.invalidate("books")
+        return book_id
+
+    def flushed(self):
+        """Drop what a ``WriteBuffer`` flush made stale; its ``on_flush`` hook"""
+        self.invalidate("books", "updates")
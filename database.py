@@ -1,18 +1,402 @@
+import atexit
+import heapq
+import random
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
 
-def init_db():
-    conn = sqlite3.connect("books.db")
-    c = conn.cursor()
-    c.execute('''
+import metrics
+from metrics import timed
+
+DB_PATH = "books.db"
+
+# Applied to every new connection. WAL lets readers and the writer run side
+# by side, and the cache/mmap sizes keep hot pages in memory between calls.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=1000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Writers take the lock up front with BEGIN IMMEDIATE. When busy_timeout runs
+# out because another process holds it, the BEGIN is retried after a random
+# sleep below a delay that doubles each time, so waiting processes spread out.
+WRITE_RETRIES = 8
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+
+# Durability modes map to PRAGMA synchronous. In WAL mode "normal" can lose
+# the last commits on power failure but never corrupts; "off" leaves syncing
+# to the OS entirely.
+DURABILITY_MODES = {"full": "FULL", "normal": "NORMAL", "off": "OFF"}
+SYNCHRONOUS = "NORMAL"
+
+# Progress handler granularity, in SQLite virtual machine instructions
+PROGRESS_STEPS = 1000
+
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX|TRIGGER)\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)",
+                              re.IGNORECASE)
+
+
+def statement_name(sql):
+    """Short metric name for a statement, such as sql.insert updates"""
+    words = sql.split(None, 1)
+    verb = words[0].lower() if words else "empty"
+    match = _STATEMENT_TABLE.search(sql)
+    return f"sql.{verb} {match.group(1)}" if match else f"sql.{verb}"
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection that records per-statement latency and affected rows.
+
+    Used for connections opened while metrics are enabled; switching
+    metrics on or off has every thread reconnect on its next call. An
+    explicit BEGIN IMMEDIATE waits for the write lock, so the "sql.begin"
+    histogram is the lock wait; lock timeouts are counted as well.
+    """
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self._timed(super().executemany, sql, parameters)
+
+    def _timed(self, method, sql, parameters):
+        name = statement_name(sql)
+        start = time.perf_counter()
+        try:
+            cursor = method(sql, parameters)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                metrics.increment("sql.lock_errors")
+            raise
+        finally:
+            metrics.observe(name, time.perf_counter() - start)
+        if cursor.rowcount > 0:
+            metrics.increment(name + ".rows", cursor.rowcount)
+        return cursor
+
+
+def _count_statement(sql):
+    # Trace callbacks also see statements run by triggers
+    metrics.increment("sql.statements")
+
+
+def _count_progress():
+    metrics.increment("sql.vm_steps", PROGRESS_STEPS)
+    return 0
+
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+class _Owner:
+    """Kept only in thread-local storage, so it is dropped when its thread ends"""
+
+
+def _release(conn):
+    """Close the connection of a finished thread"""
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def get_connection():
+    """Return this thread's connection, opening and tuning it on first use.
+
+    The connection is closed once its thread finishes, so short-lived
+    worker threads do not leave connections and file handles behind.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and (_local.generation == _generation or _in_transaction(conn)):
+        if _local.synchronous != SYNCHRONOUS:
+            conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+            _local.synchronous = SYNCHRONOUS
+        return conn
+    factory = InstrumentedConnection if metrics.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(DB_PATH, cached_statements=256, check_same_thread=False,
+                           factory=factory)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    if metrics.ENABLED:
+        conn.set_trace_callback(_count_statement)
+        conn.set_progress_handler(_count_progress, PROGRESS_STEPS)
+    with _connections_lock:
+        _connections.append(conn)
+        _local.conn = conn
+        _local.generation = _generation
+        _local.synchronous = SYNCHRONOUS
+    # Outside the lock: replacing an older owner releases its connection
+    _local.owner = _Owner()
+    weakref.finalize(_local.owner, _release, conn)
+    return conn
+
+
+def _in_transaction(conn):
+    # A renewed thread keeps its connection until the open transaction ends
+    try:
+        return conn.in_transaction
+    except sqlite3.ProgrammingError:  # Closed by close_connections
+        return False
+
+
+def renew_connections():
+    """Have every thread open a new connection on its next call.
+
+    Unlike ``close_connections`` nothing is closed here, so it is safe while
+    other threads are mid-query; each old connection is closed once its
+    thread has replaced it or finished.
+    """
+    global _generation
+    with _connections_lock:
+        _generation += 1
+
+
+# Instrumented connections are chosen when a connection opens
+metrics.on_toggle(renew_connections)
+
+
+def close_connections():
+    """Close every pooled connection; threads reconnect lazily afterwards"""
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+        _generation += 1
+
+
+def set_durability(mode):
+    """Select "full", "normal" or "off"; each thread applies it on its next call"""
+    global SYNCHRONOUS
+    SYNCHRONOUS = DURABILITY_MODES[mode]
+
+
+def set_db_path(path):
+    """Point the module at another database file (used by tools and benchmarks)"""
+    global DB_PATH
+    close_connections()
+    DB_PATH = path
+
+
+atexit.register(close_connections)
+
+
+def is_locked(error):
+    """True for the busy/locked errors another connection's lock produces"""
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+def begin_immediate(conn):
+    """Start a write transaction, retrying with jittered backoff while locked"""
+    delay = RETRY_BASE_DELAY
+    for attempt in range(WRITE_RETRIES):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not is_locked(e) or attempt == WRITE_RETRIES - 1:
+                raise
+        metrics.increment("sql.write_retries")
+        time.sleep(random.uniform(0, delay))
+        delay = min(delay * 2, RETRY_MAX_DELAY)
+
+
+@contextmanager
+def write_transaction():
+    """Run the block in one BEGIN IMMEDIATE transaction on this thread's connection.
+
+    Taking the write lock before the first read means two writers never
+    deadlock upgrading their locks; the block commits on success and rolls
+    back on any exception. Readers outside a transaction keep reading the
+    last committed snapshot meanwhile, since WAL never makes them wait.
+    """
+    conn = get_connection()
+    begin_immediate(conn)
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# Rollups summarise the updates log per book per day and per week (weeks are
+# keyed by their Monday). Pages read is the forward progress since the book's
+# previous update; going back a few pages counts as zero, not negative.
+# The updates_rollup trigger maintains them on every insert, so they stay
+# current for update_page, bulk updates and imports alike. A backdated insert
+# gets the right delta itself but leaves the next row's delta stale, so
+# history imports finish with rebuild_rollups().
+#
+# Rollups are computed from ``source``, whose rows may each stand for several
+# merged sessions (see apply_retention); migration 3 predates that and reads
+# the plain updates table.
+def rollup_deltas(source, sessions):
+    return f"""
+    WITH deltas AS (
+        SELECT book_id, page, timestamp, id, {sessions} AS sessions,
+               MAX(page - COALESCE(LAG(page) OVER (PARTITION BY book_id ORDER BY timestamp, id), 0), 0) AS pages
+        FROM {source}
+    )
+"""
+
+def rollup_rebuild(source, sessions):
+    deltas = rollup_deltas(source, sessions)
+    return (
+        "DELETE FROM daily_book_stats",
+        "DELETE FROM weekly_book_stats",
+        "DELETE FROM book_activity",
+        deltas + """
+        INSERT INTO daily_book_stats (day, book_id, pages_read, sessions)
+        SELECT substr(timestamp, 1, 10), book_id, SUM(pages), SUM(sessions)
+        FROM deltas GROUP BY 1, 2
+        """,
+        deltas + """
+        INSERT INTO weekly_book_stats (week, book_id, pages_read, sessions)
+        SELECT date(timestamp, 'weekday 0', '-6 days'), book_id, SUM(pages), SUM(sessions)
+        FROM deltas GROUP BY 1, 2
+        """,
+        f"""
+        INSERT INTO book_activity (book_id, last_page, last_timestamp)
+        SELECT book_id, page, timestamp FROM (
+            SELECT book_id, page, timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY timestamp DESC, id DESC) AS rn
+            FROM {source}
+        ) WHERE rn = 1
+        """,
+    )
+
+def analytics_rebuild(source, sessions):
+    """Recompute the hourly rollup from the log and the lifetime book totals
+    from the daily rollup, which must already be current"""
+    return (
+        "DELETE FROM hourly_stats",
+        rollup_deltas(source, sessions) + """
+        INSERT INTO hourly_stats (hour, pages_read, sessions)
+        SELECT substr(timestamp, 1, 13), SUM(pages), SUM(sessions)
+        FROM deltas GROUP BY 1
+        """,
+        """
+        UPDATE book_activity SET
+            first_day = totals.first_day,
+            pages_read = totals.pages_read,
+            sessions = totals.sessions,
+            reading_days = totals.reading_days
+        FROM (
+            SELECT book_id, MIN(day) AS first_day, SUM(pages_read) AS pages_read,
+                   SUM(sessions) AS sessions, COUNT(*) AS reading_days
+            FROM daily_book_stats GROUP BY book_id
+        ) AS totals
+        WHERE book_activity.book_id = totals.book_id
+        """,
+    )
+
+# Page of the book's update just before NEW, looking in the archive once the
+# live log has no earlier row
+PREVIOUS_PAGE = """COALESCE(
+    (SELECT page FROM updates
+     WHERE book_id = NEW.book_id AND (timestamp, id) < (NEW.timestamp, NEW.id)
+     ORDER BY timestamp DESC, id DESC LIMIT 1),
+    (SELECT page FROM updates_archive
+     WHERE book_id = NEW.book_id AND timestamp <= NEW.timestamp
+     ORDER BY timestamp DESC LIMIT 1),
+    0)"""
+
+# Pages read by the update the trigger is handling, once book_activity has it
+LATEST_PAGES_READ = "(SELECT last_pages_read FROM book_activity WHERE book_id = NEW.book_id)"
+
+# The updates trigger as of migration 7. The book_activity upsert runs first:
+# it works out the update's pages read once, into last_pages_read, for the
+# other rollups to reuse (the WHERE true lets SQLite parse its ON CONFLICT
+# after a SELECT), and counts reading_days before the daily upsert creates
+# that day's row.
+def rollup_trigger(previous_page):
+    return f"""
+        CREATE TRIGGER updates_rollup AFTER INSERT ON updates
+        BEGIN
+            INSERT INTO book_activity (book_id, last_page, last_timestamp, first_day,
+                                       pages_read, sessions, reading_days, last_pages_read)
+            SELECT NEW.book_id, NEW.page, NEW.timestamp, substr(NEW.timestamp, 1, 10),
+                   pages, NEW.sessions, 1, pages
+            FROM (SELECT MAX(NEW.page - {previous_page}, 0) AS pages)
+            WHERE true
+            ON CONFLICT (book_id) DO UPDATE SET
+                last_page = CASE WHEN excluded.last_timestamp >= last_timestamp
+                                 THEN excluded.last_page ELSE last_page END,
+                last_timestamp = MAX(last_timestamp, excluded.last_timestamp),
+                first_day = MIN(first_day, excluded.first_day),
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions,
+                reading_days = reading_days + NOT EXISTS (
+                    SELECT 1 FROM daily_book_stats
+                    WHERE day = excluded.first_day AND book_id = excluded.book_id),
+                last_pages_read = excluded.pages_read;
+            INSERT INTO daily_book_stats (day, book_id, pages_read, sessions)
+            VALUES (substr(NEW.timestamp, 1, 10), NEW.book_id,
+                    {LATEST_PAGES_READ}, NEW.sessions)
+            ON CONFLICT (day, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions;
+            INSERT INTO weekly_book_stats (week, book_id, pages_read, sessions)
+            VALUES (date(NEW.timestamp, 'weekday 0', '-6 days'), NEW.book_id,
+                    {LATEST_PAGES_READ}, NEW.sessions)
+            ON CONFLICT (week, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions;
+            INSERT INTO hourly_stats (hour, pages_read, sessions)
+            VALUES (substr(NEW.timestamp, 1, 13), {LATEST_PAGES_READ}, NEW.sessions)
+            ON CONFLICT (hour) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions;
+        END
+        """
+
+# PREVIOUS_PAGE once archived rows keep their id (migration 8): the archive
+# is searched in the same (timestamp, id) order as the live log
+PREVIOUS_PAGE_BY_ID = """COALESCE(
+    (SELECT page FROM updates
+     WHERE book_id = NEW.book_id AND (timestamp, id) < (NEW.timestamp, NEW.id)
+     ORDER BY timestamp DESC, id DESC LIMIT 1),
+    (SELECT page FROM updates_archive
+     WHERE book_id = NEW.book_id AND (timestamp, id) < (NEW.timestamp, NEW.id)
+     ORDER BY timestamp DESC, id DESC LIMIT 1),
+    0)"""
+
+# Schema changes are applied in order and recorded in PRAGMA user_version, so
+# each one runs exactly once per database file. Append new steps; never edit
+# an existing one.
+MIGRATIONS = (
+    # 1: original tables
+    (
+        '''
         CREATE TABLE IF NOT EXISTS books (
             id INTEGER PRIMARY KEY,
             title TEXT NOT NULL,
             total_pages INTEGER NOT NULL,
             current_page INTEGER DEFAULT 0
         )
-    ''')
-    c.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS updates (
             id INTEGER PRIMARY KEY,
             book_id INTEGER,
@@ -20,41 +404,676 @@ def init_db():
             timestamp TEXT,
             FOREIGN KEY(book_id) REFERENCES books(id)
         )
-    ''')
-    conn.commit()
-    conn.close()
+        ''',
+    ),
+    # 2: fixed-width local ISO timestamps so text order is time order, plus
+    # indexes for range scans over time and per-book history
+    (
+        """
+        UPDATE updates SET timestamp = strftime('%Y-%m-%dT%H:%M:%S', timestamp)
+        WHERE strftime('%Y-%m-%dT%H:%M:%S', timestamp) IS NOT NULL
+          AND timestamp != strftime('%Y-%m-%dT%H:%M:%S', timestamp)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_updates_timestamp ON updates(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_updates_book_timestamp ON updates(book_id, timestamp)",
+    ),
+    # 3: incrementally maintained reading rollups, backfilled from the log
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS daily_book_stats (
+            day TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            pages_read INTEGER NOT NULL DEFAULT 0,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, book_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS weekly_book_stats (
+            week TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            pages_read INTEGER NOT NULL DEFAULT 0,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (week, book_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS book_activity (
+            book_id INTEGER PRIMARY KEY,
+            last_page INTEGER NOT NULL,
+            last_timestamp TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS updates_rollup AFTER INSERT ON updates
+        BEGIN
+            INSERT INTO daily_book_stats (day, book_id, pages_read, sessions)
+            VALUES (substr(NEW.timestamp, 1, 10), NEW.book_id,
+                    MAX(NEW.page - COALESCE((SELECT page FROM updates
+                                             WHERE book_id = NEW.book_id
+                                               AND (timestamp, id) < (NEW.timestamp, NEW.id)
+                                             ORDER BY timestamp DESC, id DESC LIMIT 1), 0), 0), 1)
+            ON CONFLICT (day, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + 1;
+            INSERT INTO weekly_book_stats (week, book_id, pages_read, sessions)
+            VALUES (date(NEW.timestamp, 'weekday 0', '-6 days'), NEW.book_id,
+                    MAX(NEW.page - COALESCE((SELECT page FROM updates
+                                             WHERE book_id = NEW.book_id
+                                               AND (timestamp, id) < (NEW.timestamp, NEW.id)
+                                             ORDER BY timestamp DESC, id DESC LIMIT 1), 0), 0), 1)
+            ON CONFLICT (week, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + 1;
+            INSERT INTO book_activity (book_id, last_page, last_timestamp)
+            VALUES (NEW.book_id, NEW.page, NEW.timestamp)
+            ON CONFLICT (book_id) DO UPDATE SET
+                last_page = excluded.last_page,
+                last_timestamp = excluded.last_timestamp
+            WHERE excluded.last_timestamp >= book_activity.last_timestamp;
+        END
+        ''',
+    ) + rollup_rebuild("updates", "1"),
+    # 4: full-text index over titles, kept in sync by triggers
+    (
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, content='books', content_rowid='id', prefix='1 2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title) VALUES (NEW.id, NEW.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+            INSERT INTO books_fts (rowid, title) VALUES (NEW.id, NEW.title);
+        END
+        """,
+        "INSERT INTO books_fts (books_fts) VALUES ('rebuild')",
+    ),
+    # 5: sortable columns and (key, id) indexes for keyset pagination
+    (
+        """
+        ALTER TABLE books ADD COLUMN progress REAL GENERATED ALWAYS AS (
+            CASE WHEN total_pages > 0 THEN CAST(current_page AS REAL) / total_pages ELSE 0 END
+        ) VIRTUAL
+        """,
+        "ALTER TABLE books ADD COLUMN last_updated TEXT NOT NULL DEFAULT ''",
+        """
+        UPDATE books SET last_updated = (
+            SELECT last_timestamp FROM book_activity WHERE book_id = books.id
+        ) WHERE id IN (SELECT book_id FROM book_activity)
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS updates_last_updated AFTER INSERT ON updates BEGIN
+            UPDATE books SET last_updated = NEW.timestamp
+            WHERE id = NEW.book_id AND last_updated < NEW.timestamp;
+        END
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_books_title ON books(title, id)",
+        "CREATE INDEX IF NOT EXISTS idx_books_progress ON books(progress, id)",
+        "CREATE INDEX IF NOT EXISTS idx_books_last_updated ON books(last_updated, id)",
+    ),
+    # 6: retention - merged session counts, a compact archive for old rows,
+    # and rollups that read both through the update_history view
+    (
+        "ALTER TABLE updates ADD COLUMN sessions INTEGER NOT NULL DEFAULT 1",
+        """
+        CREATE TABLE IF NOT EXISTS updates_archive (
+            book_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            page INTEGER NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (book_id, timestamp)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE VIEW IF NOT EXISTS update_history AS
+        SELECT id, book_id, page, timestamp, sessions FROM updates
+        UNION ALL
+        SELECT NULL, book_id, page, timestamp, sessions FROM updates_archive
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS maintenance (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """,
+        "DROP TRIGGER IF EXISTS updates_rollup",
+        f"""
+        CREATE TRIGGER updates_rollup AFTER INSERT ON updates
+        BEGIN
+            INSERT INTO daily_book_stats (day, book_id, pages_read, sessions)
+            VALUES (substr(NEW.timestamp, 1, 10), NEW.book_id,
+                    MAX(NEW.page - {PREVIOUS_PAGE}, 0), NEW.sessions)
+            ON CONFLICT (day, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions;
+            INSERT INTO weekly_book_stats (week, book_id, pages_read, sessions)
+            VALUES (date(NEW.timestamp, 'weekday 0', '-6 days'), NEW.book_id,
+                    MAX(NEW.page - {PREVIOUS_PAGE}, 0), NEW.sessions)
+            ON CONFLICT (week, book_id) DO UPDATE SET
+                pages_read = pages_read + excluded.pages_read,
+                sessions = sessions + excluded.sessions;
+            INSERT INTO book_activity (book_id, last_page, last_timestamp)
+            VALUES (NEW.book_id, NEW.page, NEW.timestamp)
+            ON CONFLICT (book_id) DO UPDATE SET
+                last_page = excluded.last_page,
+                last_timestamp = excluded.last_timestamp
+            WHERE excluded.last_timestamp >= book_activity.last_timestamp;
+        END
+        """,
+    ),
+    # 7: reading analytics - an hourly rollup for weekday/hour heatmaps and
+    # lifetime totals per book on book_activity, kept by the same trigger
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS hourly_stats (
+            hour TEXT PRIMARY KEY,
+            pages_read INTEGER NOT NULL DEFAULT 0,
+            sessions INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        "ALTER TABLE book_activity ADD COLUMN first_day TEXT NOT NULL DEFAULT ''",
+        "ALTER TABLE book_activity ADD COLUMN pages_read INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE book_activity ADD COLUMN sessions INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE book_activity ADD COLUMN reading_days INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE book_activity ADD COLUMN last_pages_read INTEGER NOT NULL DEFAULT 0",
+        "DROP TRIGGER IF EXISTS updates_rollup",
+        rollup_trigger(PREVIOUS_PAGE),
+    ) + analytics_rebuild("update_history", "sessions"),
+    # 8: archived rows keep their id, so updates logged in the same second
+    # stay apart instead of merging into one row whose page delta differs
+    # from theirs; rows archived before this get id 0. The archive is also
+    # indexed by time for range reads.
+    (
+        "DROP TRIGGER IF EXISTS updates_rollup",
+        "DROP VIEW IF EXISTS update_history",
+        """
+        CREATE TABLE updates_archive_v8 (
+            book_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            page INTEGER NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (book_id, timestamp, id)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT INTO updates_archive_v8 (book_id, timestamp, id, page, sessions)
+        SELECT book_id, timestamp, 0, page, sessions FROM updates_archive
+        """,
+        "DROP TABLE updates_archive",
+        "ALTER TABLE updates_archive_v8 RENAME TO updates_archive",
+        "CREATE INDEX IF NOT EXISTS idx_updates_archive_timestamp ON updates_archive(timestamp, id)",
+        """
+        CREATE VIEW update_history AS
+        SELECT id, book_id, page, timestamp, sessions FROM updates
+        UNION ALL
+        SELECT id, book_id, page, timestamp, sessions FROM updates_archive
+        """,
+        rollup_trigger(PREVIOUS_PAGE_BY_ID),
+    ),
+)
+ROLLUP_SOURCE = ("update_history", "sessions")
+SCHEMA_VERSION = len(MIGRATIONS)
+INCREMENTAL_AUTO_VACUUM = 2
+
+
+@timed("db.init_db")
+def init_db():
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    if version == 0:
+        # Only takes effect while the file has no tables yet
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    with write_transaction():
+        # Another process may have migrated while this one waited for the lock
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statements in MIGRATIONS[version:]:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_AUTO_VACUUM:
+        # Older files need one full VACUUM before incremental_vacuum can work
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
 
+def now_timestamp():
+    """Current local time in the fixed-width form stored in updates.timestamp"""
+    return datetime.now().isoformat(timespec="seconds")
+
+def days_ago(days):
+    """Timestamp bound for midnight ``days`` days back, usable in range scans"""
+    return (date.today() - timedelta(days=days)).isoformat()
+
+@timed("db.add_book")
 def add_book(title, total_pages):
-    conn = sqlite3.connect("books.db")
-    c = conn.cursor()
-    c.execute("INSERT INTO books (title, total_pages) VALUES (?, ?)", (title, total_pages))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        cursor = conn.execute("INSERT INTO books (title, total_pages) VALUES (?, ?)", (title, total_pages))
+    return cursor.lastrowid
+
+@timed("db.delete_book")
+def delete_book(book_id):
+    with write_transaction() as conn:
+        # hourly_stats is not per book, so take the book's share back out
+        conn.execute(rollup_deltas(
+            "(SELECT * FROM update_history WHERE book_id = ?)", "sessions") + """
+            UPDATE hourly_stats SET
+                pages_read = hourly_stats.pages_read - book.pages_read,
+                sessions = hourly_stats.sessions - book.sessions
+            FROM (
+                SELECT substr(timestamp, 1, 13) AS hour, SUM(pages) AS pages_read,
+                       SUM(sessions) AS sessions
+                FROM deltas GROUP BY 1
+            ) AS book
+            WHERE hourly_stats.hour = book.hour
+        """, (book_id,))
+        conn.execute("DELETE FROM hourly_stats WHERE sessions <= 0")
+        conn.execute("DELETE FROM updates WHERE book_id=?", (book_id,))
+        conn.execute("DELETE FROM updates_archive WHERE book_id=?", (book_id,))
+        conn.execute("DELETE FROM daily_book_stats WHERE book_id=?", (book_id,))
+        conn.execute("DELETE FROM weekly_book_stats WHERE book_id=?", (book_id,))
+        conn.execute("DELETE FROM book_activity WHERE book_id=?", (book_id,))
+        conn.execute("DELETE FROM books WHERE id=?", (book_id,))
 
+@timed("db.get_books")
 def get_books():
-    conn = sqlite3.connect("books.db")
-    c = conn.cursor()
-    c.execute("SELECT * FROM books")
-    books = c.fetchall()
-    conn.close()
-    return books
+    return get_connection().execute(
+        "SELECT id, title, total_pages, current_page FROM books").fetchall()
 
+SORT_TITLE = "title"
+SORT_PROGRESS = "progress"
+SORT_UPDATED = "last_updated"
+SORT_KEYS = (SORT_TITLE, SORT_PROGRESS, SORT_UPDATED)
+PAGE_SIZE = 200
+
+@timed("db.get_books_page")
+def get_books_page(sort=SORT_TITLE, descending=False, after=None, limit=PAGE_SIZE):
+    """One page of books ordered by ``sort``, using keyset pagination.
+
+    ``after`` is the cursor returned with the previous page, or None for the
+    first page. Returns ``(rows, cursor)`` where rows are shaped like
+    ``get_books`` and cursor is None once there are no more pages. Each page
+    is a seek on the ``(sort, id)`` index, so late pages cost the same as the
+    first.
+    """
+    return _books_page("books b", [], [], sort, descending, after, limit)
+
+def _books_page(source, clauses, params, sort, descending, after, limit):
+    if sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort key: {sort}")
+    order = "DESC" if descending else "ASC"
+    clauses, params = list(clauses), list(params)
+    if after is not None:
+        clauses.append(f"(b.{sort}, b.id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    params.append(limit)
+    rows = get_connection().execute(
+        f"SELECT b.id, b.title, b.total_pages, b.current_page, b.{sort} FROM {source}{where} "
+        f"ORDER BY b.{sort} {order}, b.id {order} LIMIT ?", params).fetchall()
+    cursor = (rows[-1][4], rows[-1][0]) if len(rows) == limit else None
+    return [row[:4] for row in rows], cursor
+
+@timed("db.update_page")
 def update_page(book_id, page):
-    conn = sqlite3.connect("books.db")
-    c = conn.cursor()
-    c.execute("UPDATE books SET current_page=? WHERE id=?", (page, book_id))
-    c.execute("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
-              (book_id, page, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    """Set a book's current page and log it; returns 0 if there is no such book"""
+    with write_transaction() as conn:
+        if not conn.execute("UPDATE books SET current_page=? WHERE id=?", (page, book_id)).rowcount:
+            return 0
+        conn.execute("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
+                     (book_id, page, now_timestamp()))
+    return 1
+
+def chunked(rows, size):
+    """Split any iterable into lists of at most ``size`` items"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@timed("db.add_books_bulk")
+def add_books_bulk(books, chunk_size=5000):
+    """Insert ``(title, total_pages[, current_page])`` rows in one transaction.
+
+    ``books`` may be any iterable, including a generator reading a file; it
+    is consumed ``chunk_size`` rows at a time. Returns the number of rows.
+    """
+    count = 0
+    with write_transaction() as conn:
+        for chunk in chunked(books, chunk_size):
+            conn.executemany(
+                "INSERT INTO books (title, total_pages, current_page) VALUES (?, ?, ?)",
+                [(book[0], book[1], book[2] if len(book) > 2 else 0) for book in chunk])
+            count += len(chunk)
+    return count
+
+@timed("db.update_pages_bulk")
+def update_pages_bulk(updates, chunk_size=5000):
+    """Apply ``(book_id, page[, timestamp[, sessions]])`` rows in order in one transaction.
+
+    Each row sets the book's current page and is logged in ``updates``, like
+    ``update_page``; rows without a timestamp are stamped with the current
+    time, and ``sessions`` says how many page updates the row stands for.
+    Rows for books that do not exist are skipped. Returns the number of
+    rows applied.
+    """
+    count = 0
+    with write_transaction() as conn:
+        for chunk in chunked(updates, chunk_size):
+            now = now_timestamp()
+            rows = [(row[0], row[1], row[2] if len(row) > 2 else now, row[3] if len(row) > 3 else 1,
+                     row[0]) for row in chunk]
+            conn.executemany("UPDATE books SET current_page=? WHERE id=?",
+                             [(row[1], row[0]) for row in rows])
+            count += conn.executemany(
+                "INSERT INTO updates (book_id, page, timestamp, sessions) "
+                "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM books WHERE id = ?)", rows).rowcount
+    return count
+
+def range_filter(column, start=None, end=None):
+    """WHERE clause and parameters for ``column`` in ``[start, end)``; None is unbounded"""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append(f"{column} < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+@timed("db.count_updates")
+def count_updates(start=None, end=None):
+    where, params = range_filter("timestamp", start, end)
+    conn = get_connection()
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {table}" + where, params).fetchone()[0]
+               for table in ("updates", "updates_archive"))
+
+def iter_updates(start=None, end=None, chunk_size=1000):
+    """Yield lists of (book_id, page, timestamp) rows, archived ones included,
+    without loading them all.
+
+    The log and the archive are each read in (timestamp, id) order off their
+    time index and merged here; sorting the update_history view instead
+    would hold every row in a temporary b-tree first.
+    """
+    where, params = range_filter("timestamp", start, end)
+    conn = get_connection()
+    cursors = [conn.execute(f"SELECT book_id, page, timestamp, id FROM {table}" + where +
+                            " ORDER BY timestamp, id", params)
+               for table in ("updates_archive", "updates")]
+    merged = heapq.merge(*cursors, key=itemgetter(2, 3))
+    while True:
+        rows = [row[:3] for row in islice(merged, chunk_size)]
+        if not rows:
+            break
+        yield rows
 
+ALL_BOOKS = "all"
+UNFINISHED = "unfinished"
+FINISHED = "finished"
+RECENT = "recent"
+
+# Book list filters, as SQL conditions on the books table aliased "b"
+BOOK_FILTERS = {
+    ALL_BOOKS: None,
+    UNFINISHED: "b.current_page < b.total_pages",
+    FINISHED: "b.current_page >= b.total_pages",
+    RECENT: "b.id IN (SELECT book_id FROM book_activity WHERE last_timestamp >= ?)",
+}
+RECENT_DAYS = 7
+
+def fts_query(text):
+    """Turn user input into an FTS5 query matching every word as a prefix"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+@timed("db.search_books")
+def search_books(text="", book_filter=ALL_BOOKS, sort=SORT_TITLE, descending=False, after=None,
+                 limit=PAGE_SIZE):
+    """Books whose title words start with the words of ``text``, narrowed by a filter.
+
+    Pages through the matches like ``get_books_page``, in the same order and
+    with the same cursors, and returns ``(rows, cursor)`` the same way.
+    """
+    source, clauses, params = _search_source(text, book_filter)
+    return _books_page(source, clauses, params, sort, descending, after, limit)
+
+def _search_source(text, book_filter):
+    clauses, params = [], []
+    query = fts_query(text)
+    if query:
+        source = "books_fts JOIN books b ON b.id = books_fts.rowid"
+        clauses.append("books_fts MATCH ?")
+        params.append(query)
+    else:
+        source = "books b"
+    condition = BOOK_FILTERS[book_filter]
+    if condition:
+        clauses.append(condition)
+        if book_filter == RECENT:
+            params.append(days_ago(RECENT_DAYS))
+    return source, clauses, params
+
+@timed("db.preceding_book")
+def preceding_book(book_id, text="", book_filter=ALL_BOOKS, sort=SORT_TITLE, descending=False):
+    """Where a book falls in a ``search_books`` listing.
+
+    Returns ``(found, previous_id)``: whether the book is in the listing at
+    all, and the id of the book just before it, None when it comes first.
+    Both lookups are single seeks on the ``(sort, id)`` index.
+    """
+    source, clauses, params = _search_source(text, book_filter)
+    rows, cursor = _books_page(source, clauses + ["b.id = ?"], params + [book_id],
+                               sort, descending, None, 1)
+    if not rows:
+        return False, None
+    rows, _ = _books_page(source, clauses, params, sort, not descending, cursor, 1)
+    return True, rows[0][0] if rows else None
+
+@timed("db.get_weekly_stats")
 def get_weekly_stats():
-    conn = sqlite3.connect("books.db")
-    c = conn.cursor()
-    c.execute("""
+    return get_connection().execute("""
         SELECT book_id, page, timestamp FROM updates
-        WHERE date(timestamp) >= date('now', '-7 day')
-    """)
-    results = c.fetchall()
-    conn.close()
-    return results
+        WHERE timestamp >= ?
+    """, (days_ago(7),)).fetchall()
+
+@timed("db.rebuild_rollups")
+def rebuild_rollups():
+    """Recompute every rollup table from the updates log and its archive"""
+    with write_transaction() as conn:
+        for statement in rollup_rebuild(*ROLLUP_SOURCE) + analytics_rebuild(*ROLLUP_SOURCE):
+            conn.execute(statement)
+
+@timed("db.check_rollups")
+def check_rollups():
+    """Compare the rollups with the updates log and archive; returns the rows that disagree.
+
+    Each mismatch is ``(table, key, book_id, stored, expected)`` where the
+    last two are ``(pages_read, sessions)`` tuples, or None when missing.
+    """
+    conn = get_connection()
+    mismatches = []
+    # (table, key column, key from the log, book column, GROUP BY)
+    checks = (
+        ("daily_book_stats", "day", "substr(timestamp, 1, 10)", "book_id", "1, 2"),
+        ("weekly_book_stats", "week", "date(timestamp, 'weekday 0', '-6 days')", "book_id", "1, 2"),
+        ("hourly_stats", "hour", "substr(timestamp, 1, 13)", "NULL", "1"),
+        ("book_activity", "first_day", "MIN(substr(timestamp, 1, 10))", "book_id", "2"),
+    )
+    for table, key, bucket, book, group in checks:
+        expected = {
+            (row[0], row[1]): (row[2], row[3])
+            for row in conn.execute(rollup_deltas(*ROLLUP_SOURCE) + f"""
+                SELECT {bucket}, {book}, SUM(pages), SUM(sessions) FROM deltas GROUP BY {group}
+            """)
+        }
+        stored = {
+            (row[0], row[1]): (row[2], row[3])
+            for row in conn.execute(f"SELECT {key}, {book}, pages_read, sessions FROM {table}")
+        }
+        for bucket_key in sorted(expected.keys() | stored.keys()):
+            if expected.get(bucket_key) != stored.get(bucket_key):
+                mismatches.append((table,) + bucket_key +
+                                  (stored.get(bucket_key), expected.get(bucket_key)))
+    return mismatches
+
+@timed("db.get_daily_stats")
+def get_daily_stats(start=None, end=None):
+    """(day, book_id, pages_read, sessions) rows for days in ``[start, end)``"""
+    where, params = range_filter("day", start, end)
+    return get_connection().execute(
+        "SELECT day, book_id, pages_read, sessions FROM daily_book_stats" + where +
+        " ORDER BY day, book_id", params).fetchall()
+
+@timed("db.get_weekly_totals")
+def get_weekly_totals(start=None, end=None):
+    """(week, book_id, pages_read, sessions) rows for weeks starting in ``[start, end)``"""
+    where, params = range_filter("week", start, end)
+    return get_connection().execute(
+        "SELECT week, book_id, pages_read, sessions FROM weekly_book_stats" + where +
+        " ORDER BY week, book_id", params).fetchall()
+
+@timed("db.get_monthly_totals")
+def get_monthly_totals(start=None, end=None):
+    """(month, book_id, pages_read, sessions) rows summed from the daily rollup"""
+    where, params = range_filter("day", start, end)
+    return get_connection().execute(
+        "SELECT substr(day, 1, 7), book_id, SUM(pages_read), SUM(sessions) FROM daily_book_stats" +
+        where + " GROUP BY 1, 2 ORDER BY 1, 2", params).fetchall()
+
+@timed("db.get_book_activity")
+def get_book_activity():
+    """(book_id, last_page, last_timestamp) for every book that has been updated"""
+    return get_connection().execute(
+        "SELECT book_id, last_page, last_timestamp FROM book_activity").fetchall()
+
+@timed("db.count_daily_stats")
+def count_daily_stats(start=None, end=None):
+    where, params = range_filter("day", start, end)
+    return get_connection().execute("SELECT COUNT(*) FROM daily_book_stats" + where, params).fetchone()[0]
+
+def iter_daily_stats(start=None, end=None, chunk_size=1000):
+    """Like ``iter_updates`` but over the daily rollup"""
+    where, params = range_filter("day", start, end)
+    cursor = get_connection().execute(
+        "SELECT day, book_id, pages_read, sessions FROM daily_book_stats" + where +
+        " ORDER BY day, book_id", params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+# Retention policy defaults; every maintenance function takes them as arguments
+SESSION_WINDOW_MINUTES = 30
+ARCHIVE_AFTER_DAYS = 365
+VACUUM_STEP_PAGES = 256
+
+def get_maintenance(key, default=None):
+    row = get_connection().execute("SELECT value FROM maintenance WHERE key=?", (key,)).fetchone()
+    return default if row is None else row[0]
+
+@timed("db.coalesce_updates")
+def coalesce_updates(window_minutes=SESSION_WINDOW_MINUTES):
+    """Merge bursts of updates to the same book into one row per burst.
+
+    Updates of a book in the same clock hour less than ``window_minutes``
+    apart form a burst, as long as its pages never go down, counting from
+    the update before it. Its last row survives, carrying the burst's
+    session count, and the rest are deleted. The survivor's page delta is
+    then the sum of the burst's deltas and a burst never spans two rollup
+    buckets, so the rollups stay as they are and still match the log. A
+    step back ends the burst, since the rollups count it as zero rather
+    than subtracting it. Only rows from one window before the previous run
+    onwards are scanned. Returns the number of rows removed.
+    """
+    window = timedelta(minutes=window_minutes)
+    with write_transaction() as conn:
+        # Read the mark under the lock so two processes never coalesce the same rows
+        mark = get_maintenance("coalesced_until", "")
+        since = (datetime.fromisoformat(mark) - window).isoformat(timespec="seconds") if mark else ""
+        rows = conn.execute("""
+            SELECT id, book_id, timestamp, sessions, page >= COALESCE(
+                LAG(page) OVER (PARTITION BY book_id ORDER BY timestamp, id),
+                (SELECT page FROM updates p
+                 WHERE p.book_id = u.book_id AND (p.timestamp, p.id) < (u.timestamp, u.id)
+                 ORDER BY p.timestamp DESC, p.id DESC LIMIT 1),
+                (SELECT page FROM updates_archive a
+                 WHERE a.book_id = u.book_id AND (a.timestamp, a.id) < (u.timestamp, u.id)
+                 ORDER BY a.timestamp DESC, a.id DESC LIMIT 1),
+                0)
+            FROM updates u WHERE timestamp >= ?
+            ORDER BY book_id, timestamp, id
+        """, (since,)).fetchall()
+        deleted, merged = [], []
+        previous = None
+        latest = mark
+        for row_id, book_id, timestamp, sessions, rising in rows:
+            moment = datetime.fromisoformat(timestamp)
+            if (previous is not None and previous[1] == book_id and previous[4] == timestamp[:13]
+                    and moment - previous[2] < window and rising and previous[5]):
+                deleted.append((previous[0],))
+                sessions += previous[3]
+                merged.append((sessions, row_id))
+            previous = (row_id, book_id, moment, sessions, timestamp[:13], rising)
+            latest = max(latest, timestamp)
+        conn.executemany("UPDATE updates SET sessions=? WHERE id=?", merged)
+        conn.executemany("DELETE FROM updates WHERE id=?", deleted)
+        conn.execute("INSERT OR REPLACE INTO maintenance (key, value) VALUES ('coalesced_until', ?)",
+                     (latest,))
+    return len(deleted)
+
+@timed("db.archive_updates")
+def archive_updates(days=ARCHIVE_AFTER_DAYS):
+    """Move updates older than ``days`` into the compact archive table.
+
+    Archived rows still count for exports, rollup rebuilds and page deltas.
+    Returns the number of rows moved.
+    """
+    cutoff = days_ago(days)
+    with write_transaction() as conn:
+        conn.execute("""
+            INSERT INTO updates_archive (book_id, timestamp, id, page, sessions)
+            SELECT book_id, timestamp, id, page, sessions FROM updates
+            WHERE timestamp < ?
+        """, (cutoff,))
+        cursor = conn.execute("DELETE FROM updates WHERE timestamp < ?", (cutoff,))
+    return cursor.rowcount
+
+@timed("db.incremental_vacuum")
+def incremental_vacuum(pages=VACUUM_STEP_PAGES):
+    """Return up to ``pages`` free pages to the OS; returns how many are left.
+
+    Each call is its own short transaction, so callers can loop over it
+    while other writers get in between steps.
+    """
+    conn = get_connection()
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def apply_retention(window_minutes=SESSION_WINDOW_MINUTES, archive_after_days=ARCHIVE_AFTER_DAYS,
+                    vacuum_step_pages=VACUUM_STEP_PAGES):
+    """Run the whole retention policy in one go; returns what each step did"""
+    result = {
+        "coalesced": coalesce_updates(window_minutes),
+        "archived": archive_updates(archive_after_days),
+    }
+    while incremental_vacuum(vacuum_step_pages):
+        pass
+    return result
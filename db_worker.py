@@ -0,0 +1,109 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+
+class DatabaseWorker:
+    """Runs database calls on one background thread and reports back to Tk.
+
+    ``submit`` queues a call and returns a ``Future``. Callbacks are not run
+    on the worker; results are queued and delivered from the Tk main loop by
+    ``root.after`` polling, so callbacks may touch widgets freely. Calls
+    submitted with the same ``key`` while one is still queued share that
+    request, which collapses bursts of refreshes into a single query.
+
+    Each poll also measures how late the main loop ran it, which is a direct
+    reading of input latency while the worker is busy.
+    """
+
+    POLL_MS = 20
+
+    def __init__(self, root):
+        self.root = root
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.max_lag_ms = 0.0
+        self.last_lag_ms = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="database-worker", daemon=True)
+        self.thread.start()
+        self.expected_poll = time.perf_counter() + self.POLL_MS / 1000
+        self.root.after(self.POLL_MS, self.poll)
+
+    def submit(self, func, *args, callback=None, errback=None, key=None):
+        with self.pending_lock:
+            if key is not None and key in self.pending:
+                future, callbacks = self.pending[key]
+                callbacks.append((callback, errback))
+                return future
+            future = Future()
+            callbacks = [(callback, errback)]
+            if key is not None:
+                self.pending[key] = (future, callbacks)
+        self.requests.put((future, func, args, key, callbacks, time.perf_counter()))
+        return future
+
+    def call_in_main(self, func, *args):
+        """Run ``func(*args)`` on the Tk thread at the next poll; safe from any thread"""
+        future = Future()
+        future.set_result(None)
+        self.results.put((future, [(lambda result: func(*args), None)]))
+
+    def run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            future, func, args, key, callbacks, submitted = item
+            if metrics.ENABLED:
+                metrics.observe("worker.queue_wait", time.perf_counter() - submitted)
+            # Once started, later submits with this key must queue a new call
+            # so they see any writes made after this one began
+            with self.pending_lock:
+                if key is not None and self.pending.get(key, (None,))[0] is future:
+                    del self.pending[key]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            self.results.put((future, callbacks))
+
+    def poll(self):
+        now = time.perf_counter()
+        self.last_lag_ms = max(0.0, (now - self.expected_poll) * 1000)
+        self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+        if metrics.ENABLED:
+            metrics.observe("gui.loop_lag", self.last_lag_ms / 1000)
+        while True:
+            try:
+                future, callbacks = self.results.get_nowait()
+            except queue.Empty:
+                break
+            error = future.exception()
+            for callback, errback in callbacks:
+                # A failing callback is reported like any Tk callback error
+                # and must not stop the results after it from being delivered
+                try:
+                    if error is None and callback:
+                        callback(future.result())
+                    elif error is not None and errback:
+                        errback(error)
+                except Exception:
+                    self.root.report_callback_exception(*sys.exc_info())
+        if self.running:
+            self.expected_poll = time.perf_counter() + self.POLL_MS / 1000
+            self.root.after(self.POLL_MS, self.poll)
+
+    def stop(self, timeout=5):
+        """Finish queued calls, then stop the thread"""
+        self.running = False
+        self.requests.put(None)
+        self.thread.join(timeout)
@@ -1,7 +1,170 @@
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import get_books, update_page, add_book
-from utils import export_stats_to_csv
+from tkinter import ttk
+from library import Library, UPDATED
+import database
+import metrics
+from database import days_ago
+from cache import ReadCache
+from db_worker import DatabaseWorker
+from write_buffer import WriteBuffer
+
+# Keystrokes closer together than this are searched once
+SEARCH_DEBOUNCE_MS = 30
+
+FILTER_LABELS = {
+    database.ALL_BOOKS: "All books",
+    database.UNFINISHED: "Unfinished",
+    database.FINISHED: "Finished",
+    database.RECENT: "Recently updated",
+}
+
+# Book list sort orders: label -> (sort key, descending)
+SORT_LABELS = {
+    "Title A-Z": (database.SORT_TITLE, False),
+    "Most progress": (database.SORT_PROGRESS, True),
+    "Recently updated": (database.SORT_UPDATED, True),
+}
+
+# Retention runs on the database worker shortly after startup and then hourly
+RETENTION_DELAY_MS = 60 * 1000
+RETENTION_INTERVAL_MS = 60 * 60 * 1000
+
+# Snapshots are copied on their own thread a few minutes after startup and
+# then every few hours; a run is skipped while the newest snapshot is recent
+BACKUP_DELAY_MS = 5 * 60 * 1000
+BACKUP_INTERVAL_MS = 6 * 60 * 60 * 1000
+# Seconds slept between copy steps so page updates are not held up behind it
+BACKUP_PAUSE = 0.005
+
+# Fetch the next page once the viewport is this many rows from the end
+PAGE_PREFETCH = 20
+
+# Every book card has the same height so the visible slice of the library can
+# be computed from the scroll offset alone.
+ROW_HEIGHT = 130
+ROW_PADDING = 8
+OVERSCAN = 3
+
+
+class BookRow:
+    """A reusable book card that is rebound to whichever book scrolls into view"""
+
+    def __init__(self, app):
+        self.app = app
+        self.book = None
+        self.hover = False
+        
+        # Main book frame
+        self.frame = tk.Frame(app.canvas, 
+                              bg="#2d3748", 
+                              relief=tk.RAISED, 
+                              bd=2,
+                              padx=15, 
+                              pady=15)
+        self.frame.pack_propagate(False)
+        self.window = app.canvas.create_window(0, 0, window=self.frame, anchor="nw",
+                                               width=app.canvas.winfo_width(),
+                                               height=ROW_HEIGHT - 2 * ROW_PADDING,
+                                               state="hidden")
+        
+        # Book title
+        self.title_lbl = tk.Label(self.frame, 
+                                  font=("Arial", 14, "bold"),
+                                  fg="#e2e8f0",
+                                  bg="#2d3748")
+        self.title_lbl.pack(anchor="w", pady=(0, 8))
+        
+        # Progress bar
+        progress_frame = tk.Frame(self.frame, bg="#2d3748")
+        progress_frame.pack(fill=tk.X, pady=(0, 8))
+        
+        self.bar = ttk.Progressbar(progress_frame, 
+                                   length=350, 
+                                   mode='determinate',
+                                   style="Custom.Horizontal.TProgressbar")
+        self.bar.pack(side=tk.LEFT)
+        
+        self.progress_text = tk.Label(progress_frame,
+                                      font=("Arial", 10, "bold"),
+                                      fg="#ff7f00",
+                                      bg="#2d3748")
+        self.progress_text.pack(side=tk.RIGHT, padx=(10, 0))
+        
+        # Page info
+        page_info = tk.Frame(self.frame, bg="#2d3748")
+        page_info.pack(fill=tk.X)
+        
+        self.page_lbl = tk.Label(page_info,
+                                 font=("Arial", 10),
+                                 fg="#94a3b8",
+                                 bg="#2d3748")
+        self.page_lbl.pack(side=tk.LEFT, anchor="w")
+        
+        self.remaining_lbl = tk.Label(page_info,
+                                      font=("Arial", 10, "italic"),
+                                      fg="#64748b",
+                                      bg="#2d3748")
+        self.remaining_lbl.pack(side=tk.RIGHT)
+        
+        # Bindings are made once and look up the current book at event time
+        for widget in (self.frame, self.title_lbl, self.page_lbl, self.remaining_lbl):
+            widget.bind("<Button-1>", self.on_click)
+        self.frame.bind("<Enter>", self.on_enter)
+        self.frame.bind("<Leave>", self.on_leave)
+
+    def show(self, index, book):
+        """Bind this row to a book and move it to that book's slot"""
+        self.app.canvas.coords(self.window, 0, index * ROW_HEIGHT + ROW_PADDING)
+        self.app.canvas.itemconfigure(self.window, state="normal")
+        if book != self.book:
+            self.book = book
+            self.update_content()
+        self.paint()
+
+    def hide(self):
+        """Park an unused row off screen"""
+        self.book = None
+        self.app.canvas.itemconfigure(self.window, state="hidden")
+
+    def update_content(self):
+        """Refresh the labels and progress bar from the bound book"""
+        book_id, title, total_pages, current_page = self.book
+        progress = int((current_page / total_pages) * 100) if total_pages else 0
+        
+        title_display = title if len(title) <= 40 else title[:40] + "..."
+        self.title_lbl.configure(text=title_display)
+        self.bar['value'] = progress
+        self.progress_text.configure(text=f"{progress}%")
+        self.page_lbl.configure(text=f"Progress: {current_page} / {total_pages} pages")
+        
+        remaining_pages = total_pages - current_page
+        self.remaining_lbl.configure(
+            text=f"{remaining_pages} pages left" if remaining_pages > 0 else ""
+        )
+
+    def paint(self):
+        """Apply the selection or hover background"""
+        if self.book is not None and self.book[0] == self.app.selected_book_id:
+            bg = "#1e40af"  # Darker blue for selection
+        elif self.hover:
+            bg = "#374151"
+        else:
+            bg = "#2d3748"
+        self.frame.configure(bg=bg)
+
+    def on_enter(self, event):
+        self.hover = True
+        self.paint()
+
+    def on_leave(self, event):
+        self.hover = False
+        self.paint()
+
+    def on_click(self, event):
+        if self.book is not None:
+            self.app.select_book(self.book[0], self.book[1])
+
 
 class BookKeeperApp:
     def __init__(self, root):
@@ -13,19 +176,48 @@ class BookKeeperApp:
         # Configure custom style
         self.setup_styles()
         
-        self.book_frames = []
+        self.library = Library()
+        self.library.subscribe(self.on_library_change)
+        self.rows = []
         self.selected_book_id = None
-        self.selected_frame = None
+        self.export_job = None
+        self.search_params = ("", database.ALL_BOOKS)
+        self.sort_order = SORT_LABELS["Title A-Z"]
+        self.page_cursor = None
+        self.loading_page = False
+        self.search_after_id = None
+        
+        # All database calls run here so the main loop never waits on disk
+        self.db = DatabaseWorker(self.root)
+        self.cache = ReadCache()
+        # Page updates are group-committed; failures surface on the Tk thread
+        self.writes = WriteBuffer(
+            on_error=lambda e: self.db.call_in_main(self.show_db_error, e),
+            on_flush=self.cache.flushed)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(RETENTION_DELAY_MS, self.run_retention)
+        self.backups = None
+        self.root.after(BACKUP_DELAY_MS, self.run_backup)
+        
+        # Hidden diagnostics panel
+        self.diagnostics_window = None
+        self.root.bind("<Control-Shift-D>", lambda e: self.show_diagnostics())
         
         # Create main header
         self.create_header()
         
+        # Create search box and filter
+        self.create_search_bar()
+        
         # Create scrollable books container
         self.create_books_container()
         
         # Create control panel
         self.create_control_panel()
         
+        # Schema setup and the first page load both happen on the worker,
+        # so the window paints before the database is touched
+        self.db.submit(database.init_db, errback=self.show_db_error)
         self.refresh_books()
 
     def setup_styles(self):
@@ -60,32 +252,106 @@ class BookKeeperApp:
                                  bg="#1a2332")
         subtitle_label.pack(side=tk.TOP)
 
+    def create_search_bar(self):
+        """Create the search box and status filter above the book list"""
+        search_frame = tk.Frame(self.root, bg="#1a2332")
+        search_frame.pack(fill=tk.X, padx=20)
+        
+        tk.Label(search_frame, text="🔍", 
+                font=("Arial", 12),
+                fg="#94a3b8", bg="#1a2332").pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame,
+                                textvariable=self.search_var,
+                                font=("Arial", 11),
+                                bg="#2d3748",
+                                fg="#e2e8f0",
+                                insertbackground="#ff7f00",
+                                relief=tk.FLAT,
+                                bd=5)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        
+        self.filter_var = tk.StringVar(value=FILTER_LABELS[database.ALL_BOOKS])
+        filter_box = ttk.Combobox(search_frame,
+                                  textvariable=self.filter_var,
+                                  values=list(FILTER_LABELS.values()),
+                                  state="readonly",
+                                  width=16)
+        filter_box.pack(side=tk.RIGHT)
+        
+        self.sort_var = tk.StringVar(value="Title A-Z")
+        sort_box = ttk.Combobox(search_frame,
+                                textvariable=self.sort_var,
+                                values=list(SORT_LABELS),
+                                state="readonly",
+                                width=16)
+        sort_box.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        filter_box.bind("<<ComboboxSelected>>", lambda e: self.schedule_search())
+        sort_box.bind("<<ComboboxSelected>>", lambda e: self.schedule_search())
+
+    def schedule_search(self):
+        """Debounce typing so only the last keystroke in a burst runs a query"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.apply_search)
+
+    def apply_search(self):
+        self.search_after_id = None
+        label = self.filter_var.get()
+        book_filter = next(key for key, value in FILTER_LABELS.items() if value == label)
+        self.search_params = (self.search_var.get(), book_filter)
+        self.sort_order = SORT_LABELS[self.sort_var.get()]
+        self.refresh_books()
+
+    def search_active(self, search_params=None):
+        text, book_filter = search_params or self.search_params
+        return bool(text.strip()) or book_filter != database.ALL_BOOKS
+
     def create_books_container(self):
         """Create scrollable container for books"""
         # Main container frame
         container_frame = tk.Frame(self.root, bg="#1a2332")
         container_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
         
-        # Canvas and scrollbar for scrolling
-        canvas = tk.Canvas(container_frame, bg="#1a2332", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(container_frame, orient="vertical", command=canvas.yview)
-        self.books_container = tk.Frame(canvas, bg="#1a2332")
+        # Canvas and scrollbar for scrolling. Rows are placed directly on the
+        # canvas so only the visible ones need real widgets.
+        self.canvas = tk.Canvas(container_frame, bg="#1a2332", highlightthickness=0)
+        scrollbar = ttk.Scrollbar(container_frame, orient="vertical", command=self.canvas.yview)
         
-        self.books_container.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        def _on_yscroll(first, last):
+            scrollbar.set(first, last)
+            self.render_visible_rows()
         
-        canvas.create_window((0, 0), window=self.books_container, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.configure(yscrollcommand=_on_yscroll)
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
         
-        canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Empty state, shown when the library has no books
+        self.empty_label = tk.Label(self.canvas,
+                                    text="📚 No books yet!\nClick 'Add New Book' to get started",
+                                    font=("Arial", 14),
+                                    fg="#94a3b8",
+                                    bg="#1a2332",
+                                    justify=tk.CENTER)
+        self.empty_window = self.canvas.create_window(0, 50, window=self.empty_label,
+                                                      anchor="n", state="hidden")
+        
         # Bind mousewheel to canvas
         def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
+            self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        self.canvas.bind_all("<MouseWheel>", _on_mousewheel)
+
+    def on_canvas_resize(self, event):
+        """Stretch rows to the canvas width and fill any newly exposed space"""
+        self.canvas.coords(self.empty_window, event.width // 2, 50)
+        for row in self.rows:
+            self.canvas.itemconfigure(row.window, width=event.width)
+        self.render_visible_rows()
 
     def create_control_panel(self):
         """Create the control panel with buttons and inputs"""
@@ -157,130 +423,186 @@ class BookKeeperApp:
                               cursor="hand2")
         export_btn.pack(side=tk.LEFT)
 
-    def clear_book_frames(self):
-        """Clear all book frames"""
-        for frame in self.book_frames:
-            frame.destroy()
-        self.book_frames = []
-
     def refresh_books(self):
-        """Refresh the books display"""
-        self.clear_book_frames()
-        books = get_books()
-        
-        if not books:
-            # Show empty state
-            empty_frame = tk.Frame(self.books_container, bg="#1a2332")
-            empty_frame.pack(fill=tk.X, pady=50)
-            
-            empty_label = tk.Label(empty_frame,
-                                  text="📚 No books yet!\nClick 'Add New Book' to get started",
-                                  font=("Arial", 14),
-                                  fg="#94a3b8",
-                                  bg="#1a2332",
-                                  justify=tk.CENTER)
-            empty_label.pack()
-            
-            self.book_frames.append(empty_frame)
+        """Reload the books in the background and redraw when they arrive"""
+        self.db.submit(self.load_books, callback=self.show_books, errback=self.show_db_error,
+                       key="refresh")
+
+    def load_books(self):
+        """Fetch the first page for the current view; runs on the database worker.
+
+        The search and sort are read when the query runs rather than when it
+        was submitted, so a coalesced refresh always reflects the latest
+        input. Returns ``(rows, cursor)``.
+        """
+        return self.fetch_page(self.search_params, self.sort_order, None)
+
+    def fetch_page(self, search_params, sort_order, cursor):
+        """One page of the view after ``cursor``; runs on the database worker"""
+        text, book_filter = search_params
+        sort, descending = sort_order
+        if not self.search_active(search_params):
+            books, next_cursor = self.cache.get_books_page(sort, descending, cursor)
+        else:
+            books, next_cursor = self.cache.search_books(text, book_filter, sort, descending, cursor)
+        # Show pages still waiting in the write buffer, not the stored ones
+        return self.writes.overlay(books), next_cursor
+
+    @metrics.timed("gui.show_books")
+    def show_books(self, result):
+        """Display a freshly loaded first page of books"""
+        books, self.page_cursor = result
+        self.loading_page = False
+        self.library.loaded(books)
+        self.update_scrollregion()
+        self.render_visible_rows()
+
+    def load_next_page(self):
+        """Fetch the page after the last loaded book in the background"""
+        self.loading_page = True
+        cursor = self.page_cursor
+        
+        def on_page(result):
+            if cursor != self.page_cursor:
+                return  # The list was reloaded meanwhile
+            books, self.page_cursor = result
+            self.loading_page = False
+            self.library.appended(books)
+            self.update_scrollregion()
+            self.render_visible_rows()
+        
+        def on_error(error):
+            if cursor == self.page_cursor:
+                # Scrolling near the end again retries the same page
+                self.loading_page = False
+            self.show_db_error(error)
+        
+        self.db.submit(self.fetch_page, self.search_params, self.sort_order, cursor,
+                       callback=on_page, errback=on_error)
+
+    def run_retention(self):
+        """Coalesce and archive old updates, then shrink the file step by step.
+
+        Each vacuum step is a separate worker request, so page updates made
+        meanwhile are queued between steps rather than behind the whole run.
+        """
+        def vacuum_step(pages_left=None):
+            if pages_left != 0:
+                self.db.submit(database.incremental_vacuum, callback=vacuum_step,
+                               errback=self.show_db_error)
+        
+        self.db.submit(database.coalesce_updates, errback=self.show_db_error)
+        self.db.submit(database.archive_updates, callback=lambda moved: vacuum_step(),
+                       errback=self.show_db_error)
+        self.root.after(RETENTION_INTERVAL_MS, self.run_retention)
+
+    def run_backup(self):
+        """Snapshot the database in the background; reads and writes carry on"""
+        # Imported here to keep the backup machinery out of startup
+        from backup import ScheduledBackup
+        
+        if self.backups is None:
+            self.backups = ScheduledBackup(
+                min_age=BACKUP_INTERVAL_MS / 1000, pause=BACKUP_PAUSE,
+                on_error=lambda e: self.db.call_in_main(self.show_db_error, e))
+        self.backups.start()
+        self.root.after(BACKUP_INTERVAL_MS, self.run_backup)
+
+    def show_db_error(self, error):
+        from tkinter import messagebox
+        messagebox.showerror("Database Error", f"Database operation failed: {str(error)}")
+
+    def on_close(self):
+        """Let queued writes finish before the window goes away"""
+        if self.backups is not None:
+            self.backups.stop()
+        try:
+            self.writes.close()
+        except Exception as e:
+            self.show_db_error(e)
+        finally:
+            self.db.stop()
+            self.root.destroy()
+
+    def update_scrollregion(self):
+        """Size the canvas to the library and toggle the empty state"""
+        books = self.library.books
+        self.canvas.configure(scrollregion=(0, 0, 0, len(books) * ROW_HEIGHT))
+        self.empty_label.configure(
+            text="🔍 No matching books" if self.search_active()
+            else "📚 No books yet!\nClick 'Add New Book' to get started"
+        )
+        self.canvas.itemconfigure(self.empty_window,
+                                  state="hidden" if books else "normal")
+
+    def insert_book(self, book, found, previous, search_params, sort_order):
+        """Put a newly added book in place without reloading the loaded pages.
+
+        ``found`` and ``previous`` come from ``database.preceding_book``. A
+        book sorting after the last loaded one is left to the next page fetch.
+        """
+        if not found or (search_params, sort_order) != (self.search_params, self.sort_order):
+            return  # Not in this listing, or a reload is on its way
+        if previous is None:
+            index = 0
+        elif previous in self.library.positions:
+            index = self.library.positions[previous] + 1
+        else:
+            return
+        if index < len(self.library.books) or self.page_cursor is None:
+            self.library.added(index, book)
+
+    def on_library_change(self, event, index, book):
+        """Patch the view for a single added or updated book"""
+        if event == UPDATED:
+            for row in self.rows:
+                if row.book is not None and row.book[0] == book[0]:
+                    row.book = book
+                    row.update_content()
             return
         
-        for book in books:
-            book_id, title, total_pages, current_page = book
-            progress = int((current_page / total_pages) * 100) if total_pages else 0
-            
-            # Main book frame
-            frame = tk.Frame(self.books_container, 
-                           bg="#2d3748", 
-                           relief=tk.RAISED, 
-                           bd=2,
-                           padx=15, 
-                           pady=15)
-            frame.pack(fill=tk.X, pady=8)
-            
-            # Hover effects
-            def on_enter(e, f=frame):
-                if f != self.selected_frame:
-                    f.configure(bg="#374151")
-            
-            def on_leave(e, f=frame):
-                if f != self.selected_frame:
-                    f.configure(bg="#2d3748")
-            
-            def select_book(e, bid=book_id, f=frame):
-                # Reset previous selection
-                if self.selected_frame:
-                    self.selected_frame.configure(bg="#2d3748")
-                
-                # Set new selection
-                self.selected_book_id = bid
-                self.selected_frame = f
-                f.configure(bg="#1e40af")  # Darker blue for selection
-                
-                # Update selected book label
-                book_title = title if len(title) <= 30 else title[:30] + "..."
-                self.selected_label.configure(
-                    text=f"Selected: {book_title}",
-                    fg="#ff7f00"
-                )
-            
-            frame.bind("<Button-1>", select_book)
-            frame.bind("<Enter>", on_enter)
-            frame.bind("<Leave>", on_leave)
-            
-            # Book title
-            title_display = title if len(title) <= 40 else title[:40] + "..."
-            title_lbl = tk.Label(frame, 
-                               text=title_display,
-                               font=("Arial", 14, "bold"),
-                               fg="#e2e8f0",
-                               bg="#2d3748")
-            title_lbl.pack(anchor="w", pady=(0, 8))
-            title_lbl.bind("<Button-1>", select_book)
-            
-            # Progress bar
-            progress_frame = tk.Frame(frame, bg="#2d3748")
-            progress_frame.pack(fill=tk.X, pady=(0, 8))
-            
-            bar = ttk.Progressbar(progress_frame, 
-                                length=350, 
-                                mode='determinate',
-                                style="Custom.Horizontal.TProgressbar")
-            bar['value'] = progress
-            bar.pack(side=tk.LEFT)
-            
-            progress_text = tk.Label(progress_frame,
-                                   text=f"{progress}%",
-                                   font=("Arial", 10, "bold"),
-                                   fg="#ff7f00",
-                                   bg="#2d3748")
-            progress_text.pack(side=tk.RIGHT, padx=(10, 0))
-            
-            # Page info
-            page_info = tk.Frame(frame, bg="#2d3748")
-            page_info.pack(fill=tk.X)
-            
-            page_lbl = tk.Label(page_info,
-                              text=f"Progress: {current_page} / {total_pages} pages",
-                              font=("Arial", 10),
-                              fg="#94a3b8",
-                              bg="#2d3748")
-            page_lbl.pack(side=tk.LEFT, anchor="w")
-            page_lbl.bind("<Button-1>", select_book)
-            
-            remaining_pages = total_pages - current_page
-            if remaining_pages > 0:
-                remaining_lbl = tk.Label(page_info,
-                                       text=f"{remaining_pages} pages left",
-                                       font=("Arial", 10, "italic"),
-                                       fg="#64748b",
-                                       bg="#2d3748")
-                remaining_lbl.pack(side=tk.RIGHT)
-                remaining_lbl.bind("<Button-1>", select_book)
-            
-            self.book_frames.append(frame)
+        self.update_scrollregion()
+        self.render_visible_rows()
+
+    def render_visible_rows(self):
+        """Bind pooled row widgets to the books currently in the viewport"""
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), ROW_HEIGHT)
+        first = max(0, int(top // ROW_HEIGHT) - OVERSCAN)
+        books = self.library.books
+        last = min(len(books), int((top + height) // ROW_HEIGHT) + 1 + OVERSCAN)
+        
+        while len(self.rows) < last - first:
+            self.rows.append(BookRow(self))
+        
+        for offset, row in enumerate(self.rows):
+            index = first + offset
+            if index < last:
+                row.show(index, books[index])
+            else:
+                row.hide()
+        
+        if (self.page_cursor is not None and not self.loading_page
+                and last >= len(books) - PAGE_PREFETCH):
+            self.load_next_page()
+
+    def select_book(self, book_id, title):
+        """Mark a book as selected and repaint the visible rows"""
+        self.selected_book_id = book_id
+        for row in self.rows:
+            row.paint()
+        
+        # Update selected book label
+        book_title = title if len(title) <= 30 else title[:30] + "..."
+        self.selected_label.configure(
+            text=f"Selected: {book_title}",
+            fg="#ff7f00"
+        )
 
     def update_page(self):
         """Update the current page for selected book"""
+        from tkinter import messagebox
+        
         if not self.selected_book_id:
             messagebox.showwarning("No Book Selected", 
                                  "Please select a book first by clicking on it.")
@@ -292,18 +614,21 @@ class BookKeeperApp:
                 messagebox.showerror("Invalid Input", 
                                    "Page number cannot be negative.")
                 return
-            
-            update_page(self.selected_book_id, page)
-            self.page_entry.delete(0, tk.END)
-            self.refresh_books()
-            messagebox.showinfo("Success", "Progress updated successfully!")
-            
         except ValueError:
             messagebox.showerror("Invalid Input", 
                                "Please enter a valid page number.")
+            return
+        
+        # Buffered and committed shortly; the view updates right away
+        self.writes.update_page(self.selected_book_id, page)
+        self.library.updated(self.selected_book_id, page)
+        self.page_entry.delete(0, tk.END)
+        messagebox.showinfo("Success", "Progress updated successfully!")
 
     def add_new_book(self):
         """Open dialog to add a new book"""
+        from tkinter import messagebox
+        
         new_window = tk.Toplevel(self.root)
         new_window.title("Add New Book")
         new_window.geometry("400x300")
@@ -368,15 +693,26 @@ class BookKeeperApp:
                     messagebox.showerror("Invalid Input", 
                                        "Total pages must be greater than 0.")
                     return
-                
-                add_book(title, pages)
-                new_window.destroy()
-                self.refresh_books()
-                messagebox.showinfo("Success", f"'{title}' added successfully!")
-                
             except ValueError:
                 messagebox.showerror("Invalid Input", 
                                    "Please enter a valid number for total pages.")
+                return
+            
+            search_params, sort_order = self.search_params, self.sort_order
+            
+            def add_and_locate():
+                book_id = self.cache.add_book(title, pages)
+                text, book_filter = search_params
+                return book_id, database.preceding_book(book_id, text, book_filter, *sort_order)
+            
+            def on_saved(result):
+                book_id, (found, previous) = result
+                self.insert_book((book_id, title, pages, 0), found, previous,
+                                 search_params, sort_order)
+                messagebox.showinfo("Success", f"'{title}' added successfully!")
+            
+            new_window.destroy()
+            self.db.submit(add_and_locate, callback=on_saved, errback=self.show_db_error)
         
         def cancel():
             new_window.destroy()
@@ -413,14 +749,169 @@ class BookKeeperApp:
         new_window.bind('<Return>', lambda e: save_book())
 
     def export_stats(self):
-        """Export statistics with user feedback"""
-        try:
-            export_stats_to_csv()
+        """Export statistics in the background with a progress dialog"""
+        # Imported here to keep the export machinery out of startup
+        from tkinter import messagebox
+        from utils import EXPORT_PATH, BackgroundExport, ExportCancelled
+        
+        if self.export_job is not None:
+            return
+        
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Exporting Stats")
+        progress_window.geometry("360x140")
+        progress_window.configure(bg="#1a2332")
+        progress_window.resizable(False, False)
+        progress_window.transient(self.root)
+        
+        status_label = tk.Label(progress_window,
+                                text="📊 Exporting statistics...",
+                                font=("Arial", 12, "bold"),
+                                fg="#ff7f00",
+                                bg="#1a2332")
+        status_label.pack(pady=(20, 10))
+        
+        bar = ttk.Progressbar(progress_window,
+                              length=300,
+                              mode='determinate',
+                              style="Custom.Horizontal.TProgressbar")
+        bar.pack()
+        
+        def on_progress(done, total):
+            bar['value'] = done * 100 / total if total else 100
+            status_label.configure(text=f"📊 Exported {done} of {total} rows")
+        
+        started = time.perf_counter()
+        
+        def finish():
+            if metrics.ENABLED:
+                metrics.observe("gui.export", time.perf_counter() - started)
+            self.export_job = None
+            progress_window.destroy()
+        
+        def on_done(rows):
+            finish()
             messagebox.showinfo("Export Successful", 
                               "Statistics exported successfully!")
-        except Exception as e:
+        
+        def on_error(e):
+            finish()
+            if isinstance(e, ExportCancelled):
+                return
             messagebox.showerror("Export Failed", 
                                f"Failed to export statistics: {str(e)}")
+        
+        self.export_job = BackgroundExport(self.root, EXPORT_PATH,
+                                           start=days_ago(7),
+                                           on_progress=on_progress,
+                                           on_done=on_done,
+                                           on_error=on_error)
+        
+        cancel_btn = tk.Button(progress_window,
+                               text="Cancel",
+                               command=self.export_job.cancel,
+                               bg="#64748b",
+                               fg="white",
+                               font=("Arial", 10, "bold"),
+                               relief=tk.FLAT,
+                               padx=20,
+                               cursor="hand2")
+        cancel_btn.pack(pady=10)
+        progress_window.protocol("WM_DELETE_WINDOW", self.export_job.cancel)
+        
+        self.export_job.start()
+
+    def show_diagnostics(self):
+        """Open the diagnostics panel with live latency percentiles"""
+        from tkinter import messagebox
+        
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        window.geometry("640x420")
+        window.configure(bg="#1a2332")
+        self.diagnostics_window = window
+        
+        columns = ("count", "p50", "p95", "p99", "max")
+        tree = ttk.Treeview(window, columns=columns)
+        tree.heading("#0", text="Operation")
+        tree.column("#0", width=240)
+        for column in columns:
+            tree.heading(column, text=column if column == "count" else f"{column} (ms)")
+            tree.column(column, width=70, anchor="e")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        status_label = tk.Label(window,
+                                font=("Arial", 10),
+                                fg="#94a3b8",
+                                bg="#1a2332")
+        status_label.pack()
+        
+        button_frame = tk.Frame(window, bg="#1a2332")
+        button_frame.pack(pady=(5, 10))
+        
+        def toggle():
+            if metrics.ENABLED:
+                metrics.disable()
+            else:
+                metrics.enable()
+            render()
+        
+        def dump():
+            metrics.dump("exports/metrics.json")
+            messagebox.showinfo("Diagnostics", "Metrics written to exports/metrics.json",
+                                parent=window)
+        
+        def render():
+            snapshot = metrics.snapshot()
+            tree.delete(*tree.get_children())
+            for name, summary in snapshot["histograms"].items():
+                tree.insert("", tk.END, text=name, values=(
+                    summary["count"],
+                    *(f"{summary[key] * 1000:.2f}" for key in ("p50", "p95", "p99", "max"))
+                ))
+            for name, value in snapshot["counters"].items():
+                tree.insert("", tk.END, text=name, values=(value, "", "", "", ""))
+            state = "on" if metrics.ENABLED else "off"
+            status_label.configure(text=f"Recording is {state}. Loop lag: last "
+                                        f"{self.db.last_lag_ms:.1f} ms, max {self.db.max_lag_ms:.1f} ms")
+            toggle_btn.configure(text="Stop Recording" if metrics.ENABLED else "Start Recording")
+        
+        def tick():
+            if self.diagnostics_window is window:
+                render()
+                window.after(1000, tick)
+        
+        def close():
+            self.diagnostics_window = None
+            window.destroy()
+        
+        toggle_btn = tk.Button(button_frame,
+                               command=toggle,
+                               bg="#ff7f00",
+                               fg="white",
+                               font=("Arial", 10, "bold"),
+                               relief=tk.FLAT,
+                               padx=20,
+                               cursor="hand2")
+        toggle_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        for text, command in (("Dump JSON", dump), ("Reset", lambda: (metrics.reset(), render()))):
+            tk.Button(button_frame,
+                      text=text,
+                      command=command,
+                      bg="#2d3748",
+                      fg="#e2e8f0",
+                      font=("Arial", 10, "bold"),
+                      relief=tk.FLAT,
+                      padx=20,
+                      cursor="hand2").pack(side=tk.LEFT, padx=(0, 10))
+        
+        window.protocol("WM_DELETE_WINDOW", close)
+        tick()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,102 @@
+import csv
+import json
+import os
+from datetime import datetime
+from book_manager import JOURNAL_SUFFIX, BookManager
+from database import add_books_bulk, rebuild_rollups, update_pages_bulk
+
+READ_SIZE = 65536
+
+
+def iter_json_records(path):
+    """Yield objects from a JSON array or JSON-lines file without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buffer = ""
+        eof = False
+        while True:
+            # Skip the array brackets, separators and whitespace between records
+            buffer = buffer.lstrip(" \t\r\n[,]")
+            if not buffer:
+                if eof:
+                    return
+                chunk = f.read(READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield record
+            buffer = buffer[end:]
+
+
+def iter_csv_records(path):
+    """Yield rows of a CSV file with a header as dicts"""
+    with open(path, "r", newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def iter_records(path):
+    """Yield records as dicts with snake_case keys ("Book ID" -> "book_id")"""
+    records = iter_csv_records(path) if path.lower().endswith(".csv") else iter_json_records(path)
+    for record in records:
+        yield {key.strip().lower().replace(" ", "_"): value for key, value in record.items()}
+
+
+def iter_book_records(path):
+    """Like ``iter_records``, but a ``BookManager`` store whose journal still
+    holds changes is read through ``BookManager``, snapshot plus journal"""
+    if not os.path.exists(path + JOURNAL_SUFFIX):
+        yield from iter_records(path)
+        return
+    manager = BookManager(path)
+    try:
+        yield from manager.books
+    finally:
+        manager.close()
+
+
+def import_books(path, chunk_size=5000):
+    """Add books from CSV or JSON with title, total_pages and optional current_page.
+
+    Also accepts the legacy ``storage.json`` store of ``BookManager``, which
+    names the current page ``last_page`` and keeps recent changes in a
+    journal beside it. Returns the number of books added.
+    """
+    def rows():
+        for record in iter_book_records(path):
+            current_page = record.get("current_page", record.get("last_page")) or 0
+            yield (record["title"], int(record["total_pages"]), int(current_page))
+    return add_books_bulk(rows(), chunk_size)
+
+
+def import_updates(path, chunk_size=5000):
+    """Apply page history from CSV or JSON with book_id, page and optional timestamp.
+
+    The CSV written by ``utils.export_stats`` can be imported as is. Rollups
+    are rebuilt afterwards if any row carried its own (possibly backdated)
+    timestamp. Returns the number of updates applied.
+    """
+    backdated = False
+
+    def rows():
+        nonlocal backdated
+        for record in iter_records(path):
+            timestamp = record.get("timestamp")
+            if timestamp:
+                backdated = True
+                yield (int(record["book_id"]), int(record["page"]),
+                       datetime.fromisoformat(timestamp).isoformat(timespec="seconds"))
+            else:
+                yield (int(record["book_id"]), int(record["page"]))
+    count = update_pages_bulk(rows(), chunk_size)
+    if backdated:
+        rebuild_rollups()
+    return count
@@ -0,0 +1,59 @@
+ADDED = "add"
+UPDATED = "update"
+
+
+class Library:
+    """In-memory copy of the listed books that reports row-level changes.
+
+    The listing is filled from the pages a view loads. Once a write has
+    succeeded elsewhere (e.g. on a worker thread) the caller reports it with
+    ``added`` or ``updated``, which notify subscribers with
+    ``(event, index, book)`` so the view can patch a single row instead of
+    reloading the whole table. Books are the same
+    ``(id, title, total_pages, current_page)`` tuples ``get_books`` returns.
+    """
+
+    def __init__(self):
+        self.books = []
+        self.positions = {}
+        self.listeners = []
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self, event, index, book):
+        for callback in self.listeners:
+            callback(event, index, book)
+
+    def loaded(self, books):
+        # Copied, since appended, added and updated change the list in place
+        self.books = list(books)
+        self.positions = {book[0]: index for index, book in enumerate(self.books)}
+
+    def appended(self, books):
+        """Add the next page of an already loaded listing"""
+        for book in books:
+            self.positions[book[0]] = len(self.books)
+            self.books.append(book)
+
+    def get(self, book_id):
+        index = self.positions.get(book_id)
+        return None if index is None else self.books[index]
+
+    def added(self, index, book):
+        """Insert a newly stored book at ``index`` of the listing"""
+        self.books.insert(index, book)
+        for later in self.books[index + 1:]:
+            self.positions[later[0]] += 1
+        self.positions[book[0]] = index
+        self.notify(ADDED, index, book)
+
+    def updated(self, book_id, page):
+        index = self.positions.get(book_id)
+        if index is None:
+            return None
+        book_id, title, total_pages, _ = self.books[index]
+        book = (book_id, title, total_pages, page)
+        self.books[index] = book
+        self.notify(UPDATED, index, book)
+        return book
@@ -1,12 +1,19 @@
-import os
 from tkinter import Tk
-from gui import BookKeeperApp
-from database import init_db
 
-if not os.path.exists("exports"):
-    os.makedirs("exports")
 
-init_db()
-root = Tk()
-app = BookKeeperApp(root)
-root.mainloop()
+def main():
+    # Show the empty window before importing the rest of the app, so it
+    # appears while the widgets are built and the books load in the background
+    root = Tk()
+    root.title("📚 BookKeeper - Reading Progress Tracker")
+    root.geometry("500x700")
+    root.configure(bg="#1a2332")
+    root.update()
+
+    from gui import BookKeeperApp
+    app = BookKeeperApp(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
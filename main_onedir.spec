@@ -0,0 +1,50 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Fast-starting build: a onedir bundle is not unpacked to a temp folder on
+# every launch, bytecode is precompiled with optimize=1, and UPX is off so the
+# libraries load without being decompressed first.
+#
+#     pyinstaller main_onedir.spec
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=['gui', 'utils'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=['unittest', 'pydoc', 'doctest', 'lib2to3', 'tkinter.test'],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='BookKeeper',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='BookKeeper',
+)
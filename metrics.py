@@ -0,0 +1,131 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Recording is off unless BOOKKEEPER_METRICS is set or enable() is called.
+# While off, a timed function costs one global lookup and a branch.
+ENABLED = bool(os.environ.get("BOOKKEEPER_METRICS"))
+
+SAMPLES_KEPT = 4096
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+# Called after enable() or disable() changes ENABLED
+_toggle_hooks = []
+
+
+class Histogram:
+    """Latency samples for one operation; percentiles use the most recent ones"""
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.samples.append(value)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def pick(p):
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": pick(50),
+            "p95": pick(95),
+            "p99": pick(99),
+            "max": self.max,
+        }
+
+
+def on_toggle(callback):
+    """Call ``callback()`` whenever recording is switched on or off"""
+    _toggle_hooks.append(callback)
+
+
+def _set_enabled(enabled):
+    global ENABLED
+    if ENABLED == enabled:
+        return
+    ENABLED = enabled
+    for callback in _toggle_hooks:
+        callback()
+
+
+def enable():
+    _set_enabled(True)
+
+
+def disable():
+    _set_enabled(False)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(name, seconds):
+    """Record one latency sample in seconds"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def timed(name):
+    """Decorator recording the call's latency, and its row count if it returns a list"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                increment(name + ".errors")
+                raise
+            finally:
+                observe(name, time.perf_counter() - start)
+            if isinstance(result, list):
+                increment(name + ".rows", len(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """All histograms (as summaries in seconds) and counters"""
+    with _lock:
+        return {
+            "histograms": {name: h.summary() for name, h in sorted(_histograms.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def dump(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
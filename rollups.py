@@ -0,0 +1,27 @@
+"""Maintenance commands for the reading-stats rollup tables.
+
+    python rollups.py check      report rollup rows that disagree with the log
+    python rollups.py rebuild    recompute all rollups from the updates log
+"""
+import sys
+from database import check_rollups, init_db, rebuild_rollups
+
+
+def main(argv):
+    if len(argv) != 1 or argv[0] not in ("check", "rebuild"):
+        print(__doc__.strip())
+        return 2
+    init_db()
+    if argv[0] == "rebuild":
+        rebuild_rollups()
+        print("Rollups rebuilt.")
+        return 0
+    mismatches = check_rollups()
+    for table, key, book_id, stored, expected in mismatches:
+        print(f"{table} {key} book {book_id}: stored {stored}, expected {expected}")
+    print(f"{len(mismatches)} mismatched rows.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A freshly migrated database in a temporary folder; yields its connection"""
+    database.set_db_path(str(tmp_path / "books.db"))
+    database.init_db()
+    yield database.get_connection()
+    database.close_connections()
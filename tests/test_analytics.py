@@ -0,0 +1,82 @@
+"""Incremental refreshes of ReadingAnalytics, each checked against a fresh load.
+
+Run from the project root:  python -m pytest tests
+"""
+from datetime import date, timedelta
+
+import analytics
+import database
+from analytics import ReadingAnalytics
+
+
+def log(conn, book_id, page, days, hour=9):
+    """Record an update ``days`` days back, as update_page would have then"""
+    with conn:
+        conn.execute("UPDATE books SET current_page=? WHERE id=?", (page, book_id))
+        conn.execute("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
+                     (book_id, page, f"{database.days_ago(days)}T{hour:02d}:00:00"))
+
+
+def results(reader):
+    return (reader.daily_totals(), reader.rolling_velocity(), reader.book_stats(),
+            reader.streaks(), reader.heatmap())
+
+
+def library(db):
+    first, second = database.add_book("Dune", 600), database.add_book("Emma", 400)
+    log(db, first, 40, 5)
+    log(db, first, 90, 2, hour=21)
+    log(db, second, 30, 1)
+    return first, second
+
+
+def test_refresh_skips_when_nothing_changed_and_reads_only_new_days(db):
+    first, _ = library(db)
+    reader = ReadingAnalytics()
+    results(reader)
+    assert reader.refresh() is False
+    results(reader)
+    assert reader.stats()["refreshes"] == 1
+    database.update_page(first, 120)
+    assert results(reader) == results(ReadingAnalytics())
+    assert reader.stats()["full_loads"] == 1 and reader.stats()["refreshes"] == 2
+
+
+def test_backdated_update_reloads_everything(db):
+    _, second = library(db)
+    reader = ReadingAnalytics()
+    results(reader)
+    log(db, second, 60, 3, hour=7)
+    assert results(reader) == results(ReadingAnalytics())
+    assert reader.stats()["full_loads"] == 2
+
+
+def test_deleted_book_reloads_everything(db):
+    first, _ = library(db)
+    reader = ReadingAnalytics()
+    results(reader)
+    database.delete_book(first)
+    assert results(reader) == results(ReadingAnalytics())
+    assert reader.stats()["full_loads"] == 2 and reader.stats()["books"] == 1
+
+
+def test_day_rollover_extends_the_days_without_a_full_load(db, monkeypatch):
+    current = [date.today()]
+
+    class Today(date):
+        @classmethod
+        def today(cls):
+            return current[0]
+
+    monkeypatch.setattr(analytics, "date", Today)
+    first, _ = library(db)
+    database.update_page(first, 110)
+    reader = ReadingAnalytics()
+    results(reader)
+    current[0] += timedelta(days=1)
+    rolled = results(reader)
+    assert rolled == results(ReadingAnalytics())
+    assert reader.stats() == {"full_loads": 1, "refreshes": 2, "days": 7, "books": 2}
+    assert rolled[0][-1] == (current[0].isoformat(), 0, 0)
+    # Read two days back, yesterday and today; an empty new day keeps the streak
+    assert rolled[3] == {"current": 3, "longest": 3}
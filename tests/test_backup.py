@@ -0,0 +1,59 @@
+"""Snapshot, verify and restore round trips against a throwaway database.
+
+Run from the project root:  python -m pytest tests
+"""
+import gzip
+import os
+
+import pytest
+
+import backup
+import database
+
+
+def books():
+    return database.get_connection().execute(
+        "SELECT id, title, current_page FROM books ORDER BY id").fetchall()
+
+
+def test_snapshot_restores_data_and_schema(db, tmp_path):
+    book = database.add_book("Middlemarch", 900)
+    database.update_page(book, 40)
+    directory = str(tmp_path / "backups")
+    path = backup.create_snapshot(directory, compress=True)
+    assert path.endswith(".db.gz") and backup.list_snapshots(directory) == [path]
+    with open(path + ".sha256") as f:
+        assert f.read() == f"{backup.file_sha256(path)}  {os.path.basename(path)}\n"
+    with gzip.open(path, "rb") as f:
+        assert f.read(16) == b"SQLite format 3\x00"
+    backup.verify_snapshot(path)
+
+    database.update_page(book, 300)
+    database.add_book("Nostromo", 400)
+    previous = backup.restore_snapshot(path)
+    assert books() == [(book, "Middlemarch", 40)]
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    assert database.check_rollups() == []
+    # The state just before the restore was kept, and restores in turn
+    backup.restore_snapshot(previous, snapshot_current=False)
+    assert books() == [(book, "Middlemarch", 300), (book + 1, "Nostromo", 0)]
+
+
+def test_corrupted_snapshot_is_rejected(db, tmp_path):
+    database.add_book("Walden", 300)
+    path = backup.create_snapshot(str(tmp_path / "backups"))
+    with open(path, "r+b") as f:
+        f.seek(100)
+        byte = f.read(1)
+        f.seek(100)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(backup.SnapshotError):
+        backup.verify_snapshot(path)
+    database.add_book("Emma", 400)
+    with pytest.raises(backup.SnapshotError):
+        backup.restore_snapshot(path)
+    assert [row[1] for row in books()] == ["Walden", "Emma"]
+    os.remove(path + ".sha256")
+    with pytest.raises(backup.SnapshotError):
+        backup.verify_snapshot(path)
@@ -0,0 +1,61 @@
+"""Journal replay, torn-line recovery and compaction of the JSON book store.
+
+Run from the project root:  python -m pytest tests
+"""
+import json
+import os
+
+from book_manager import BookManager
+
+
+def make(tmp_path, **options):
+    return BookManager(str(tmp_path / "storage.json"), **options)
+
+
+def test_torn_last_line_is_dropped_and_truncated(tmp_path):
+    manager = make(tmp_path)
+    manager.add_book("Dune", 600)
+    manager.update_page("Dune", 120)
+    manager.close()
+    with open(manager.journal_filename, "a") as f:
+        f.write('{"op": "page", "title": "Du')
+    complete = os.path.getsize(manager.journal_filename) - len('{"op": "page", "title": "Du')
+
+    reloaded = make(tmp_path)
+    assert reloaded.books == [{"title": "Dune", "total_pages": 600, "last_page": 120}]
+    assert os.path.getsize(reloaded.journal_filename) == complete
+    reloaded.update_page("Dune", 150)
+    reloaded.close()
+    assert make(tmp_path).books == [{"title": "Dune", "total_pages": 600, "last_page": 150}]
+
+
+def test_compaction_writes_a_snapshot_and_empties_the_journal(tmp_path):
+    manager = make(tmp_path, compact_every=3)
+    manager.add_book("Emma", 400)
+    manager.add_book("Kim", 250)
+    manager.update_page("Emma", 80)
+    manager.close()
+    with open(manager.filename) as f:
+        assert json.load(f) == manager.books
+    assert os.path.getsize(manager.journal_filename) == 0
+    assert make(tmp_path).books == manager.books
+
+
+def test_journal_left_over_a_new_snapshot_replays_cleanly(tmp_path):
+    manager = make(tmp_path)
+    manager.add_book("Emma", 400)
+    manager.update_page("Emma", 10)
+    manager.add_book("Kim", 250)
+    manager.update_page("Emma", 20)
+    with open(manager.journal_filename) as f:
+        journal = f.read()
+    # A crash after the snapshot replaced the old one but before the journal was emptied
+    manager.save_books()
+    manager.close()
+    with open(manager.journal_filename, "w") as f:
+        f.write(journal)
+
+    reloaded = make(tmp_path)
+    assert reloaded.books == [{"title": "Emma", "total_pages": 400, "last_page": 20},
+                              {"title": "Kim", "total_pages": 250, "last_page": 0}]
+    assert reloaded.journal_entries == 4
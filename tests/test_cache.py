@@ -0,0 +1,60 @@
+"""ReadCache hits, eviction and invalidation against a throwaway database.
+
+Run from the project root:  python -m pytest tests
+"""
+import threading
+
+import database
+from cache import ReadCache
+from write_buffer import WriteBuffer
+
+
+def test_least_recently_used_page_is_evicted(db):
+    database.add_books_bulk((f"Book {i}", 100) for i in range(5))
+    cache = ReadCache(max_entries=2)
+    first, _ = cache.get_books_page(limit=1)
+    cache.get_books_page(limit=2)
+    assert cache.get_books_page(limit=1) == (first, (first[0][1], first[0][0]))
+    cache.get_books_page(limit=3)  # Evicts limit=2, used longest ago
+    cache.get_books_page(limit=1)
+    cache.get_books_page(limit=2)
+    assert cache.stats() == {"hits": 2, "misses": 4, "invalidations": 1, "entries": 2}
+
+
+def test_results_are_copies(db):
+    database.add_book("Ivanhoe", 300)
+    cache = ReadCache()
+    rows, _ = cache.search_books("iva")
+    rows.append(None)
+    assert cache.search_books("iva") == ([(1, "Ivanhoe", 300, 0)], None)
+
+
+def test_writes_invalidate_locally_and_from_other_connections(db):
+    cache = ReadCache()
+    cache.add_book("Kim", 250)
+    assert cache.get_books_page() == ([(1, "Kim", 250, 0)], None)
+    cache.add_book("Nostromo", 400)
+    assert cache.get_books_page() == ([(1, "Kim", 250, 0), (2, "Nostromo", 400, 0)], None)
+
+    other = threading.Thread(target=database.update_page, args=(1, 30))
+    other.start()
+    other.join()
+    assert cache.get_books_page()[0][0] == (1, "Kim", 250, 30)
+    assert cache.stats()["hits"] == 0
+    database.close_connections()
+    cache.get_books_page()
+    assert cache.stats()["hits"] == 0
+
+
+def test_flush_hook_drops_stale_pages(db):
+    book = database.add_book("Rebecca", 380)
+    cache = ReadCache()
+    buffer = WriteBuffer(delay=60, on_flush=cache.flushed)
+    try:
+        assert cache.get_books_page() == ([(book, "Rebecca", 380, 0)], None)
+        buffer.update_page(book, 55)
+        # Flushed on this thread's connection, so data_version alone would miss it
+        assert buffer.flush() == 1
+        assert cache.get_books_page() == ([(book, "Rebecca", 380, 55)], None)
+    finally:
+        buffer.close()
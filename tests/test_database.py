@@ -0,0 +1,229 @@
+"""Schema, query plan and rollup checks against a throwaway database.
+
+Run from the project root:  python -m pytest tests
+"""
+import sqlite3
+import threading
+
+import database
+import metrics
+
+
+def log(conn, book_id, *updates):
+    """Insert ``(page, timestamp)`` updates for a book, as update_page would"""
+    with conn:
+        for page, timestamp in updates:
+            conn.execute("UPDATE books SET current_page=? WHERE id=?", (page, book_id))
+            conn.execute("INSERT INTO updates (book_id, page, timestamp) VALUES (?, ?, ?)",
+                         (book_id, page, timestamp))
+
+
+def test_time_range_uses_timestamp_index(db):
+    plan = db.execute("EXPLAIN QUERY PLAN SELECT book_id, page, timestamp "
+                      "FROM updates WHERE timestamp >= ?", (database.days_ago(7),)).fetchall()
+    assert "USING INDEX idx_updates_timestamp" in " ".join(row[-1] for row in plan)
+
+
+def test_init_db_is_idempotent(db):
+    database.init_db()
+    assert db.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+
+
+def test_migrates_original_schema(tmp_path):
+    path = str(tmp_path / "old.db")
+    database.set_db_path(path)
+    conn = database.get_connection()
+    for statement in database.MIGRATIONS[0]:
+        conn.execute(statement)
+    conn.execute("PRAGMA user_version = 1")
+    conn.execute("INSERT INTO books (title, total_pages, current_page) VALUES ('Old', 300, 40)")
+    conn.executemany("INSERT INTO updates (book_id, page, timestamp) VALUES (1, ?, ?)",
+                     [(25, "2024-01-01 09:00:00"), (40, "2024-01-02 21:15:00")])
+    conn.commit()
+    try:
+        database.init_db()
+        conn = database.get_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+        assert [row[0] for row in conn.execute("SELECT timestamp FROM updates ORDER BY id")] == [
+            "2024-01-01T09:00:00", "2024-01-02T21:15:00"]
+        assert database.get_daily_stats() == [("2024-01-01", 1, 25, 1), ("2024-01-02", 1, 15, 1)]
+        assert database.check_rollups() == []
+    finally:
+        database.close_connections()
+
+
+def test_trigger_keeps_rollups_current(db):
+    book = database.add_book("Dune", 600)
+    log(db, book, (10, "2024-03-04T08:00:00"), (50, "2024-03-04T08:20:00"),
+        (45, "2024-03-05T22:00:00"), (70, "2024-03-11T07:30:00"))
+    assert database.get_daily_stats() == [
+        ("2024-03-04", book, 50, 2), ("2024-03-05", book, 0, 1), ("2024-03-11", book, 25, 1)]
+    assert database.get_weekly_totals() == [("2024-03-04", book, 50, 3), ("2024-03-11", book, 25, 1)]
+    assert db.execute("SELECT hour, pages_read, sessions FROM hourly_stats ORDER BY hour").fetchall() == [
+        ("2024-03-04T08", 50, 2), ("2024-03-05T22", 0, 1), ("2024-03-11T07", 25, 1)]
+    assert db.execute("SELECT last_page, pages_read, reading_days FROM book_activity").fetchall() == [
+        (70, 75, 3)]
+    assert database.check_rollups() == []
+
+
+def test_check_rollups_reports_drift(db):
+    book = database.add_book("Emma", 400)
+    log(db, book, (30, "2024-05-01T10:00:00"))
+    with db:
+        db.execute("UPDATE daily_book_stats SET pages_read = 99")
+    assert database.check_rollups() == [
+        ("daily_book_stats", "2024-05-01", book, (99, 1), (30, 1))]
+    database.rebuild_rollups()
+    assert database.check_rollups() == []
+
+
+def test_delete_book_takes_its_share_out(db):
+    kept, deleted = database.add_book("Kept", 100), database.add_book("Deleted", 100)
+    log(db, kept, (20, "2024-06-01T12:00:00"))
+    log(db, deleted, (35, "2024-06-01T12:30:00"), (60, "2024-06-02T09:00:00"))
+    database.delete_book(deleted)
+    assert db.execute("SELECT hour, pages_read, sessions FROM hourly_stats").fetchall() == [
+        ("2024-06-01T12", 20, 1)]
+    assert database.check_rollups() == []
+
+
+def test_coalesce_keeps_rollups_matching_the_log(db):
+    book = database.add_book("Ulysses", 800)
+    log(db, book, (100, "2024-07-01T09:00:00"),
+        (90, "2024-07-01T10:00:00"), (120, "2024-07-01T10:05:00"), (130, "2024-07-01T10:10:00"),
+        (10, "2024-07-01T11:00:00"), (50, "2024-07-01T11:05:00"), (20, "2024-07-01T11:10:00"),
+        (60, "2024-07-01T11:14:00"))
+    # Only 120 -> 130 merges: every other pair has a step back at or before it
+    assert database.coalesce_updates() == 1
+    assert db.execute("SELECT page, sessions FROM updates ORDER BY id").fetchall() == [
+        (100, 1), (90, 1), (130, 2), (10, 1), (50, 1), (20, 1), (60, 1)]
+    assert database.check_rollups() == []
+
+
+def test_archive_keeps_same_second_updates_apart(db):
+    book = database.add_book("Beloved", 300)
+    # update_pages_bulk stamps a whole chunk with the same second
+    log(db, book, (50, "2024-01-10T08:00:00"), (40, "2024-01-10T08:00:00"),
+        (60, "2024-01-10T08:00:00"))
+    assert database.check_rollups() == []
+    assert database.archive_updates(30) == 3
+    assert db.execute("SELECT page FROM updates_archive ORDER BY timestamp, id").fetchall() == [
+        (50,), (40,), (60,)]
+    assert database.check_rollups() == []
+    database.update_page(book, 75)
+    assert db.execute("SELECT last_pages_read FROM book_activity").fetchone() == (15,)
+    assert database.check_rollups() == []
+
+
+def test_iter_updates_merges_archive_and_log_in_time_order(db):
+    book = database.add_book("Walden", 300)
+    log(db, book, (10, "2024-01-01T10:00:00"), (20, "2024-01-03T10:00:00"),
+        (30, "2024-01-03T10:00:00"), (40, "2024-01-05T10:00:00"))
+    database.archive_updates(30)
+    log(db, book, (50, "2024-01-02T10:00:00"), (60, "2024-01-04T10:00:00"))
+    assert database.count_updates() == 6
+    assert database.count_updates("2024-01-02", "2024-01-05") == 4
+    chunks = list(database.iter_updates(chunk_size=4))
+    assert [len(rows) for rows in chunks] == [4, 2]
+    assert [row[1] for rows in chunks for row in rows] == [10, 50, 20, 30, 60, 40]
+    for table in ("updates", "updates_archive"):
+        plan = " ".join(row[-1] for row in db.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {table} WHERE timestamp >= ? ORDER BY timestamp, id",
+            ("2024-01-02",)))
+        assert "USING INDEX" in plan and "TEMP B-TREE" not in plan, plan
+
+
+def test_migrates_archive_to_keep_ids(tmp_path):
+    database.set_db_path(str(tmp_path / "v7.db"))
+    conn = database.get_connection()
+    try:
+        for statements in database.MIGRATIONS[:7]:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute("PRAGMA user_version = 7")
+        conn.execute("INSERT INTO books (title, total_pages) VALUES ('Old', 300)")
+        conn.executemany("INSERT INTO updates (book_id, page, timestamp) VALUES (1, ?, ?)",
+                         [(25, "2023-01-01T09:00:00"), (40, "2023-01-02T09:00:00")])
+        conn.execute("INSERT INTO updates_archive SELECT book_id, timestamp, page, sessions "
+                     "FROM updates WHERE id = 1")
+        conn.execute("DELETE FROM updates WHERE id = 1")
+        conn.commit()
+        database.init_db()
+        conn = database.get_connection()
+        assert conn.execute("SELECT id, page FROM updates_archive").fetchall() == [(0, 25)]
+        assert database.check_rollups() == []
+        database.update_page(1, 70)
+        assert database.check_rollups() == []
+    finally:
+        database.close_connections()
+
+def test_search_pages_through_every_match_in_order(db):
+    database.add_books_bulk((f"River {i:03d}", 100) for i in range(250))
+    database.add_books_bulk((f"Stone {i:03d}", 100) for i in range(50))
+    with db:
+        db.execute("UPDATE books SET current_page = 100 WHERE id % 3 = 0")
+    for text, book_filter in (("riv", database.ALL_BOOKS), ("", database.UNFINISHED)):
+        rows, cursor = [], None
+        while True:
+            page, cursor = database.search_books(text, book_filter, database.SORT_TITLE, True,
+                                                 cursor, limit=40)
+            rows.extend(page)
+            if cursor is None:
+                break
+        expected = db.execute(
+            "SELECT id, title, total_pages, current_page FROM books b WHERE "
+            + ("title LIKE 'River%'" if text else database.BOOK_FILTERS[book_filter])
+            + " ORDER BY title DESC, id DESC").fetchall()
+        assert rows == expected and len(rows) > 150
+
+
+def test_updates_to_missing_books_are_skipped(db):
+    book = database.add_book("Persuasion", 250)
+    assert database.update_page(book + 1, 10) == 0
+    assert database.update_pages_bulk([(book, 20), (book + 1, 30), (book, 40)]) == 2
+    assert db.execute("SELECT book_id, page FROM updates ORDER BY id").fetchall() == [
+        (book, 20), (book, 40)]
+    assert database.check_rollups() == []
+
+
+def test_preceding_book_places_a_new_book_in_the_listing(db):
+    for title in ("Bleak House", "Dracula", "Frankenstein"):
+        database.add_book(title, 300)
+    book = database.add_book("Emma", 300)
+    assert database.preceding_book(book) == (True, 2)
+    assert database.preceding_book(book, sort=database.SORT_TITLE, descending=True) == (True, 3)
+    assert database.preceding_book(book, "em") == (True, None)
+    assert database.preceding_book(book, "dra") == (False, None)
+    assert database.preceding_book(book, book_filter=database.FINISHED) == (False, None)
+    # Never updated, so last among recently updated books; the newest id goes first
+    database.update_page(1, 10)
+    assert database.preceding_book(book, sort=database.SORT_UPDATED, descending=True) == (True, 1)
+
+
+def test_toggling_metrics_renews_connections(db):
+    seen = {}
+    worker_ready, toggled = threading.Event(), threading.Event()
+
+    def worker():
+        seen["before"] = database.get_connection()
+        worker_ready.set()
+        toggled.wait(5)
+        seen["after"] = database.get_connection()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert worker_ready.wait(5)
+    try:
+        with database.write_transaction() as conn:
+            metrics.enable()
+            # A transaction in progress keeps its connection
+            assert database.get_connection() is conn
+        assert isinstance(database.get_connection(), database.InstrumentedConnection)
+        toggled.set()
+        thread.join()
+        assert isinstance(seen["after"], database.InstrumentedConnection)
+        assert not isinstance(seen["before"], database.InstrumentedConnection)
+    finally:
+        toggled.set()
+        metrics.disable()
+    assert type(database.get_connection()) is sqlite3.Connection
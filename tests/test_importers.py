@@ -0,0 +1,35 @@
+"""Importing into a throwaway database.
+
+Run from the project root:  python -m pytest tests
+"""
+import os
+
+from book_manager import BookManager
+from importers import import_books
+
+
+def test_import_books_replays_the_storage_journal(db, tmp_path):
+    path = str(tmp_path / "storage.json")
+    manager = BookManager(path)
+    for i in range(51):
+        manager.add_book(f"Book {i}", 100 + i)
+    manager.update_page("Book 7", 42)
+    manager.close()
+    assert not os.path.exists(path)
+
+    assert import_books(path) == 51
+    assert db.execute("SELECT title, total_pages, current_page FROM books WHERE title = 'Book 7'"
+                      ).fetchone() == ("Book 7", 107, 42)
+
+
+def test_import_books_reads_a_compacted_store(db, tmp_path):
+    path = str(tmp_path / "storage.json")
+    manager = BookManager(path, compact_every=3)
+    for i in range(3):
+        manager.add_book(f"Book {i}", 200)
+    manager.update_page("Book 1", 150)
+    manager.close()
+
+    assert import_books(path) == 3
+    assert db.execute("SELECT title, current_page FROM books ORDER BY id").fetchall() == [
+        ("Book 0", 0), ("Book 1", 150), ("Book 2", 0)]
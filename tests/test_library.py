@@ -0,0 +1,38 @@
+"""Row-level change events of the in-memory book listing.
+
+Run from the project root:  python -m pytest tests
+"""
+from library import ADDED, UPDATED, Library
+
+
+def listing(*books):
+    library = Library()
+    events = []
+    library.subscribe(lambda event, index, book: events.append((event, index, book)))
+    library.loaded(books[:2])
+    library.appended(books[2:])
+    return library, events
+
+
+def test_added_shifts_later_positions():
+    library, events = listing((1, "Aeneid", 400, 0), (3, "Iliad", 500, 20), (4, "Odyssey", 450, 0))
+    library.added(1, (7, "Emma", 300, 0))
+    assert events == [(ADDED, 1, (7, "Emma", 300, 0))]
+    assert [book[0] for book in library.books] == [1, 7, 3, 4]
+    assert library.positions == {1: 0, 7: 1, 3: 2, 4: 3}
+    assert library.updated(4, 90) == (4, "Odyssey", 450, 90)
+    assert events[-1] == (UPDATED, 3, (4, "Odyssey", 450, 90))
+
+
+def test_updates_to_unlisted_books_are_ignored():
+    library, events = listing((1, "Aeneid", 400, 0))
+    assert library.updated(2, 10) is None
+    assert events == []
+
+
+def test_loaded_copies_the_rows():
+    rows = [(1, "Aeneid", 400, 0)]
+    library = Library()
+    library.loaded(rows)
+    library.added(0, (2, "Beowulf", 200, 0))
+    assert rows == [(1, "Aeneid", 400, 0)]
@@ -0,0 +1,22 @@
+"""Exports from a throwaway database.
+
+Run from the project root:  python -m pytest tests
+"""
+import os
+import stat
+
+import database
+from utils import export_stats
+
+
+def test_export_gets_the_usual_file_mode(db, tmp_path):
+    book = database.add_book("Middlemarch", 900)
+    database.update_page(book, 12)
+    path = str(tmp_path / "stats.csv")
+    mask = os.umask(0o022)
+    try:
+        assert export_stats(path) == 1
+    finally:
+        os.umask(mask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert open(path).read().splitlines()[0] == "Book ID,Page,Timestamp"
@@ -0,0 +1,89 @@
+"""WriteBuffer against a throwaway database, with database writes stubbed
+where a test needs them slow or failing.
+
+Run from the project root:  python -m pytest tests
+"""
+import threading
+import time
+
+import database
+from write_buffer import WriteBuffer
+
+
+def test_pages_stay_visible_while_a_flush_commits(db, monkeypatch):
+    book = database.add_book("Hamlet", 200)
+    writing, release = threading.Event(), threading.Event()
+    bulk = database.update_pages_bulk
+
+    def slow_bulk(rows):
+        rows = list(rows)
+        writing.set()
+        release.wait(5)
+        return bulk(rows)
+
+    monkeypatch.setattr(database, "update_pages_bulk", slow_bulk)
+    buffer = WriteBuffer(delay=60)
+    try:
+        buffer.update_page(book, 42)
+        flusher = threading.Thread(target=buffer.flush)
+        flusher.start()
+        assert writing.wait(5)
+        assert buffer.get_page(book) == 42
+        assert buffer.overlay(database.get_books()) == [(book, "Hamlet", 200, 42)]
+        release.set()
+        flusher.join()
+        assert buffer.get_page(book) is None
+        assert database.get_books() == [(book, "Hamlet", 200, 42)]
+    finally:
+        release.set()
+        buffer.close()
+
+
+def test_failed_flush_merges_back_under_newer_updates(db, monkeypatch):
+    book = database.add_book("Macbeth", 200)
+    buffer = WriteBuffer(delay=60)
+    buffer.update_page(book, 10)
+    buffer.update_page(book, 20)
+
+    def failing_bulk(rows):
+        list(rows)
+        buffer.update_page(book, 30)  # Arrives while the batch is being written
+        raise OSError("disk full")
+
+    monkeypatch.setattr(database, "update_pages_bulk", failing_bulk)
+    try:
+        buffer.flush()
+    except OSError:
+        pass
+    monkeypatch.undo()
+    assert buffer.pending[book][0] == 30 and buffer.pending[book][2] == 3
+    assert buffer.get_page(book) == 30
+    buffer.close()
+    assert database.get_connection().execute(
+        "SELECT page, sessions FROM updates").fetchall() == [(30, 3)]
+
+
+def test_failing_flushes_back_off_and_report_once(db, monkeypatch):
+    book = database.add_book("Othello", 200)
+    calls, errors = [], []
+    bulk = database.update_pages_bulk
+
+    def flaky_bulk(rows):
+        calls.append(time.monotonic())
+        if len(calls) < 4:
+            raise OSError("database is locked")
+        return bulk(rows)
+
+    monkeypatch.setattr(database, "update_pages_bulk", flaky_bulk)
+    buffer = WriteBuffer(delay=0.02, on_error=errors.append)
+    try:
+        buffer.update_page(book, 15)
+        deadline = time.monotonic() + 5
+        while len(calls) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+        assert len(errors) == 1
+        assert len(gaps) == 3 and gaps[1] > 1.5 * gaps[0] and gaps[2] > 1.5 * gaps[1]
+    finally:
+        buffer.close()
+    assert database.get_books() == [(book, "Othello", 200, 15)]
@@ -1,9 +1,144 @@
 import csv
-from database import get_weekly_stats
+import gzip
+import os
+import queue
+import secrets
+import threading
+from database import count_daily_stats, count_updates, days_ago, iter_daily_stats, iter_updates
+from metrics import timed
+
+EXPORT_PATH = "exports/stats.csv"
+
+
+def make_temp_file(directory, suffix):
+    """Create an empty temporary file in ``directory`` with the usual mode.
+
+    Meant to be renamed over a final name, which then gets the permissions a
+    plain open() would have given it (0666 less the umask) instead of
+    mkstemp's owner-only ones. The name is random and the file is created
+    exclusively, as mkstemp does.
+    """
+    while True:
+        path = os.path.join(directory, f"tmp{secrets.token_hex(8)}{suffix}")
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return path
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+@timed("utils.export_stats")
+def export_stats(path, start=None, end=None, compress=False, chunk_size=1000,
+                 progress=None, cancel=None, daily=False):
+    """Stream update rows between ``start`` and ``end`` into a CSV file.
+
+    With ``daily`` set, the per-book daily rollup is exported instead of the
+    raw log, which stays small however many updates have been recorded.
+
+    Rows are read from the cursor ``chunk_size`` at a time and written to a
+    temporary file next to ``path``, which replaces ``path`` only once the
+    export is complete. ``progress(done, total)`` is called after each chunk
+    and setting the ``cancel`` event aborts the export, leaving any previous
+    file untouched. Returns the number of rows written.
+    """
+    if daily:
+        header = ["Day", "Book ID", "Pages Read", "Sessions"]
+        total = count_daily_stats(start, end)
+        chunks = iter_daily_stats(start, end, chunk_size)
+    else:
+        header = ["Book ID", "Page", "Timestamp"]
+        total = count_updates(start, end)
+        chunks = iter_updates(start, end, chunk_size)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = make_temp_file(directory, ".tmp")
+    written = 0
+    try:
+        if compress:
+            f = gzip.open(tmp_path, "wt", newline='')
+        else:
+            f = open(tmp_path, "w", newline='')
+        with f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for rows in chunks:
+                if cancel is not None and cancel.is_set():
+                    raise ExportCancelled()
+                writer.writerows(rows)
+                written += len(rows)
+                if progress is not None:
+                    progress(written, total)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return written
+
 
 def export_stats_to_csv():
-    data = get_weekly_stats()
-    with open("exports/stats.csv", "w", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Book ID", "Page", "Timestamp"])
-        writer.writerows(data)
+    return export_stats(EXPORT_PATH, start=days_ago(7))
+
+
+class BackgroundExport:
+    """Run ``export_stats`` on a worker thread and report back on the Tk thread.
+
+    The worker only puts messages on a queue; ``root.after`` polling drains it
+    and calls ``on_progress(done, total)``, ``on_done(rows)`` or
+    ``on_error(exc)`` from the main loop, where it is safe to touch widgets.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, path, on_progress=None, on_done=None, on_error=None, **options):
+        self.root = root
+        self.path = path
+        self.options = options
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.root.after(self.POLL_MS, self.poll)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            rows = export_stats(self.path,
+                                progress=lambda done, total: self.messages.put(("progress", (done, total))),
+                                cancel=self.cancel_event,
+                                **self.options)
+            self.messages.put(("done", rows))
+        except BaseException as e:
+            self.messages.put(("error", e))
+
+    def poll(self):
+        progress = None
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                # Only the latest progress matters; skip stale ones
+                progress = value
+                continue
+            if progress is not None and self.on_progress:
+                self.on_progress(*progress)
+            callback = self.on_done if kind == "done" else self.on_error
+            if callback:
+                callback(value)
+            return
+        if progress is not None and self.on_progress:
+            self.on_progress(*progress)
+        self.root.after(self.POLL_MS, self.poll)
@@ -0,0 +1,152 @@
+import atexit
+import threading
+import time
+
+import database
+
+
+class WriteBuffer:
+    """Write-behind buffer that group-commits page updates.
+
+    ``update_page`` only records the latest page per book in memory. A
+    background thread writes everything pending in one transaction when the
+    oldest pending update is ``delay`` seconds old, as soon as
+    ``max_pending`` books are waiting, on ``flush()`` and at shutdown. An
+    update that replaces a still-pending one for the same book is stored as
+    a single row counting both sessions.
+
+    ``durability`` ("full", "normal" or "off") is applied process-wide with
+    ``database.set_durability``. Readers see pages not yet committed, pending
+    or being written, through ``get_page`` and ``overlay``. Errors from a
+    background flush go to ``on_error``, which is called on the flush
+    thread; the failed updates are kept and retried after a delay that
+    doubles up to ``max_backoff`` seconds, and only the first error of a run
+    of failures is reported. ``on_flush`` is called on the flushing thread
+    after each batch commits and before it stops being visible through
+    ``overlay``, so a cache in front of the reads can drop what it made
+    stale.
+    """
+
+    def __init__(self, delay=0.25, max_pending=500, durability="normal", on_error=None,
+                 max_backoff=30.0, on_flush=None):
+        self.delay = delay
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self.on_error = on_error
+        self.on_flush = on_flush
+        self.pending = {}
+        # The batch being written: still visible to readers until it commits
+        self.in_flight = {}
+        self.first_pending = None
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="write-buffer", daemon=True)
+        database.set_durability(durability)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def update_page(self, book_id, page):
+        with self.condition:
+            previous = self.pending.get(book_id)
+            sessions = previous[2] + 1 if previous else 1
+            self.pending[book_id] = (page, database.now_timestamp(), sessions)
+            if self.first_pending is None:
+                # Wake the flusher so it starts the delay timer
+                self.first_pending = time.monotonic()
+                self.condition.notify()
+            elif len(self.pending) >= self.max_pending:
+                self.condition.notify()
+
+    def get_page(self, book_id, default=None):
+        """The newest page for a book if an update for it is not committed yet"""
+        with self.condition:
+            entry = self.pending.get(book_id) or self.in_flight.get(book_id)
+        return default if entry is None else entry[0]
+
+    def overlay(self, books):
+        """Patch ``get_books``-shaped rows with pages not committed yet"""
+        with self.condition:
+            if not self.pending and not self.in_flight:
+                return books
+            pending = {book_id: entry[0] for book_id, entry in self.in_flight.items()}
+            pending.update((book_id, entry[0]) for book_id, entry in self.pending.items())
+        return [book if book[0] not in pending else book[:3] + (pending[book[0]],)
+                for book in books]
+
+    def run(self):
+        failures = 0
+        retry_at = None
+        while True:
+            with self.condition:
+                while self.running:
+                    now = time.monotonic()
+                    if retry_at is not None:
+                        # Still failing: wait out the backoff whatever arrives
+                        remaining = retry_at - now
+                    elif len(self.pending) >= self.max_pending:
+                        break
+                    elif self.first_pending is not None:
+                        remaining = self.first_pending + self.delay - now
+                    else:
+                        remaining = None
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                failures += 1
+                # One report per failing streak; retries back off exponentially
+                if failures == 1 and self.on_error:
+                    self.on_error(e)
+                retry_at = time.monotonic() + min(self.delay * 2 ** failures, self.max_backoff)
+            else:
+                failures = 0
+                retry_at = None
+
+    def flush(self):
+        """Write all pending updates now in one transaction; returns how many"""
+        with self.flush_lock:
+            with self.condition:
+                batch = self.in_flight = self.pending
+                self.pending = {}
+                self.first_pending = None
+            if not batch:
+                return 0
+            try:
+                database.update_pages_bulk(
+                    (book_id, page, timestamp, sessions)
+                    for book_id, (page, timestamp, sessions) in batch.items())
+            except BaseException:
+                # Put the batch back under any updates that arrived meanwhile
+                with self.condition:
+                    for book_id, entry in batch.items():
+                        if book_id in self.pending:
+                            page, timestamp, sessions = self.pending[book_id]
+                            self.pending[book_id] = (page, timestamp, sessions + entry[2])
+                        else:
+                            self.pending[book_id] = entry
+                    self.in_flight = {}
+                    if self.first_pending is None:
+                        self.first_pending = time.monotonic()
+                raise
+            try:
+                if self.on_flush:
+                    self.on_flush()
+            finally:
+                with self.condition:
+                    self.in_flight = {}
+            return len(batch)
+
+    def close(self):
+        """Flush what is left and stop the background thread"""
+        if not self.running:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.flush()